@@ -1,130 +1,112 @@
 import os
-import re
-from typing import List
-from pydantic import BaseModel, Field
+from functools import lru_cache
+from pydantic import TypeAdapter
 from .get_model import get_model
+from .schemas import LegalAnalysis, RiskItem, Verdict
+from .structured import StructuredOutputShortCircuit, stream_json_response
+from .response_cache import CachedAgent
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import BaseMessage, SystemMessage
 
 
-class RiskItem(BaseModel):
-    category: str = Field(description="e.g., Non-compete, IP Ownership, Liability")
-    severity: str = Field(description="High, Medium, or Low")
-    clause_reference: str = Field(description="The snippet or section found")
-    explanation: str = Field(description="Human-like explanation of why this matters to the user's career")
-    suggestion: str = Field(description="Specific professional advice for negotiation")
+# Compact, hand-written shape hint instead of the auto-generated full
+# JSON schema — far fewer prompt tokens, same steering effect. The
+# Pydantic model still validates the parsed output.
+_FORMAT_INSTRUCTIONS = (
+    'Respond with a JSON object exactly like this:\n'
+    '{"pros": ["..."], '
+    '"cons": [{"category": "Non-compete", "severity": "High", '
+    '"clause_reference": "...", "explanation": "...", "suggestion": "..."}], '
+    '"verdict": "Negotiate", "summary": "..."}'
+)
 
-
-class LegalAnalysis(BaseModel):
-    pros: List[str] = Field(default_factory=list, description="Positive aspects for the user")
-    cons: List[RiskItem] = Field(default_factory=list, description="Detailed professional risks")
-    verdict: str = Field(description="Senior Counsel's final recommendation: 'Sign', 'Negotiate', or 'Walk Away'")
-    summary: str = Field(description="A empathetic 2-sentence takeaway for a layman")
-
-
-def clean_json_text(text: str) -> str:
-    text = re.sub(r"```json\s*|\s*```", "", text)
-    match = re.search(r"\{.*\}", text, re.DOTALL)
-    return match.group(0) if match else text
-
-def get_analyzer_agent():
-    parser = PydanticOutputParser(pydantic_object=LegalAnalysis)
-    llm = get_model(temperature=0) # Low temperature for consistent legal logic
-    
-    playbook = """
+_PLAYBOOK = """
     - NON-COMPETE: Restrictions > 6 months or broad geography are HIGH RISK.
     - TERMINATION: Notice > 3 months is MEDIUM RISK.
     - IP OWNERSHIP: Work-for-hire must be explicit; 'Moral Rights' must be protected.
     - INDEMNITY: Employee should NOT cover general company business risks.
     - VAGUENESS: Any undefined 'Discretionary' powers for the employer are HIGH RISK.
     """
-    
-    # Human-like System Prompt
-    system_instruction = (
-        f"You are a Senior Legal Partner. Analyze the discovered contract data against this Playbook:\n{playbook}\n\n"
-        "Your tone should be professional yet protective of your client. "
-        "Don't just list facts; provide counsel. "
-        "Determine a 'verdict' based on the overall balance of the document. "
-        "You MUST return ONLY a JSON object."
+
+# Human-like System Prompt.
+# Kept as one frozen, pre-interpolated string (playbook already baked in)
+# and wrapped in a prebuilt SystemMessage below: providers only give
+# prompt-cache discounts when the prefix bytes are identical across
+# calls, so nothing per-call may touch this block.
+_SYSTEM_INSTRUCTION = (
+    f"You are a Senior Legal Partner. Analyze the discovered contract data against this Playbook:\n{_PLAYBOOK}\n\n"
+    "Your tone should be professional yet protective of your client. "
+    "Don't just list facts; provide counsel. "
+    "Determine a 'verdict' based on the overall balance of the document. "
+    "You MUST return ONLY a JSON object."
+)
+
+
+# Reused validator, built once per process.
+_ANALYSIS_ADAPTER = TypeAdapter(LegalAnalysis)
+
+
+def _parse_fallback(error: Exception) -> LegalAnalysis:
+    # Locally authored, trusted data — skip validation.
+    return LegalAnalysis.model_construct(
+        pros=["Could not process pros"],
+        cons=[],
+        verdict=Verdict.NEGOTIATE,
+        summary=f"Analysis failed: {str(error)}"
     )
 
-    if os.getenv("USE_LOCAL_AI") == "true":
+# Prebuilt message: LangChain passes BaseMessage slots through verbatim,
+# skipping template rendering for the static system block entirely.
+_SYSTEM_MESSAGE = SystemMessage(content=_SYSTEM_INSTRUCTION)
+
+
+def clean_json_text(text: str) -> str:
+    # Two anchor scans (C-level find/rfind) instead of a fence-strip pass
+    # plus a DOTALL regex — one O(n) sweep, no intermediate string, no
+    # backtracking. Braces inside a ```json fence are still the outermost.
+    start = text.find("{")
+    end = text.rfind("}")
+    if start != -1 and end > start:
+        return text[start:end + 1]
+    return text
+
+@lru_cache(maxsize=4)
+def _build_analyzer_agent(use_local: bool):
+    """Compile the prompt/LLM chain once per (local|cloud) mode."""
+    llm = get_model(temperature=0, role="analyzer") # Low temperature for consistent legal logic
+
+    if use_local:
         prompt = ChatPromptTemplate.from_messages([
-            ("system", system_instruction),
+            _SYSTEM_MESSAGE,
             ("user", "Discovered Data: {extracted_json}\n\nFormat your response as JSON: {format_instructions}")
-        ]).partial(format_instructions=parser.get_format_instructions())
+        ]).partial(format_instructions=_FORMAT_INSTRUCTIONS)
+        chain = prompt | llm
 
         def local_chain(input_data):
-            raw_response = (prompt | llm).invoke(input_data)
-            content = raw_response.content if isinstance(raw_response, BaseMessage) else str(raw_response)
+            # Stream and stop once the JSON object closes — no need to
+            # wait out trailing filler tokens or rescan the full buffer.
+            content = stream_json_response(chain, input_data)
             sanitized_json = clean_json_text(content) # type: ignore
-            try:
-                return parser.parse(sanitized_json)
-            except Exception as e:
-                return LegalAnalysis(
-                    pros=["Could not process pros"],
-                    cons=[],
-                    verdict="Negotiate (due to parsing error)",
-                    summary=f"Analysis failed: {str(e)}"
-                )
-        return local_chain
+            # Decode straight into the model — skips the parser's extra
+            # json.loads pass and uses pydantic-core's fast JSON path.
+            # Parse failures raise past the cache; the fallback below is
+            # built outside it so it is never replayed for this contract.
+            return _ANALYSIS_ADAPTER.validate_json(sanitized_json)
+        return CachedAgent(
+            local_chain, "analyzer|local|" + _SYSTEM_INSTRUCTION,
+            fallback=_parse_fallback,
+        )
 
     else:
-        # Cloud Logic (DeepSeek/OpenAI)
+        # Cloud Logic (DeepSeek/OpenAI): plain call first, structured fallback
         prompt = ChatPromptTemplate.from_messages([
-            ("system", system_instruction),
+            _SYSTEM_MESSAGE,
             ("user", "Extracted Data: {extracted_json}")
         ])
-        return prompt | llm.with_structured_output(LegalAnalysis)
-
-
-
-
-
-# from typing import List
-# from pydantic import BaseModel, Field
-# # from langchain_deepseek import ChatDeepSeek
-# from .get_model import get_model
-# from langchain_core.prompts import ChatPromptTemplate
-
-# class RiskItem(BaseModel):
-#     category: str = Field(description="e.g., Non-compete, Liability, Termination")
-#     severity: str = Field(description="High, Medium, or Low")
-#     clause_reference: str = Field(description="The exact text or section number from the doc")
-#     explanation: str = Field(description="Why this is a risk for the user")
-#     suggestion: str = Field(description="How to renegotiate this clause")
-
-
-# class LegalAnalysis(BaseModel):
-#     # Use default_factory for lists and default for strings
-#     pros: List[str] = Field(default_factory=list, description="Positive aspects")
-#     cons: List[RiskItem] = Field(default_factory=list, description="Detailed risks")
-#     summary: str = Field(default="", description="1-sentence takeaway")
-
-# def get_analyzer_agent():
-#     llm = get_model(temperature=0)
-    
-#     playbook = """
-#     1. NON-COMPETE: Any non-compete over 6 months or covering a whole continent is HIGH RISK.
-#     2. TERMINATION: Notice periods longer than 3 months are MEDIUM RISK.
-#     3. IP OWNERSHIP: Ensure 'Moral Rights' are waived and work-for-hire is clearly defined.
-#     4. INDEMNITY: Employee should never indemnify the company for general business risks.
-#     """
-    
-#     prompt = ChatPromptTemplate.from_messages([
-#         ("system", (
-#             f"You are a Senior Legal Counsel. Analyze against this Playbook:\n{playbook}\n\n"
-#             "STRICT RULES:\n"
-#             "1. Output ONLY a flat JSON object.\n"
-#             "2. Do NOT use a top-level 'analysis' key.\n"
-#             "3. You MUST use these exact keys: 'pros', 'cons', 'summary'.\n"
-#             "4. Each item in 'cons' must match: {{'category': ..., 'severity': ..., 'clause_reference': ..., 'explanation': ..., 'suggestion': ...}}.\n"
-#             "5. If a playbook item isn't found, leave the list empty. Do not invent new keys."
-#         )),
-#         ("user", "Extracted Data: {extracted_json}")
-#     ])
-
-
-#     # Ensure the model is forced into JSON mode if the provider supports it
-#     return prompt | llm.with_structured_output(LegalAnalysis)
+        chain = StructuredOutputShortCircuit(prompt, llm, LegalAnalysis, clean_json_text)
+        return CachedAgent(chain, "analyzer|cloud|" + _SYSTEM_INSTRUCTION)
+
+
+def get_analyzer_agent():
+    """Analyzer agent with the compiled chain cached across calls."""
+    return _build_analyzer_agent(os.getenv("USE_LOCAL_AI") == "true")
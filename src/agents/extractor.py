@@ -1,79 +1,114 @@
 import os
-import re
-import json
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from functools import lru_cache
+from pydantic import TypeAdapter
 from .get_model import get_model
+from .schemas import LegalDiscovery
+from .structured import StructuredOutputShortCircuit, stream_json_response
+from .response_cache import CachedAgent
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import BaseMessage, SystemMessage
 
 
-class LegalDiscovery(BaseModel):
-    is_legal_document: bool = Field(description="Is this actually a legal document?")
-    document_type: str = Field(description="The specific type of agreement identified")
-    parties: List[str] = Field(default_factory=list, description="Entities involved")
-    complex_terms: List[Dict[str, str]] = Field(
-        description="List of jargon terms (e.g., 'Indemnification') and their simple layman definitions"
-    )
-    key_obligations: List[str] = Field(description="What the user is actually required to do")
-    hidden_risks: List[str] = Field(description="Subtle traps found in the fine print")
+# Compact, hand-written shape hint. PydanticOutputParser's auto-generated
+# format instructions dump the full JSON schema ($defs, every description)
+# into the prompt — hundreds of wasted tokens per call. A short example
+# steers the model just as well; the Pydantic model still validates the
+# output after parsing.
+_FORMAT_INSTRUCTIONS = (
+    'Respond with a JSON object exactly like this:\n'
+    '{"is_legal_document": true, "document_type": "Employment Agreement", '
+    '"parties": ["Acme Corp", "Jane Smith"], '
+    '"complex_terms": [{"term": "Indemnification", "definition": "You cover their losses"}], '
+    '"key_obligations": ["..."], "hidden_risks": ["..."]}'
+)
+
+_SYSTEM_INSTRUCTION = (
+    "You are a Senior Legal Counsel. Your first task is to determine if the text is a legal document. "
+    "If it is, perform a deep discovery of its substance. "
+    "Identify complex 'legalese' terms and provide simple translations. "
+    "Expose the hidden risks that a layman might miss. "
+    "You MUST return ONLY a JSON object."
+)
+
+# Built once at import — prompt construction reuses the same message
+# object instead of re-wrapping the instruction string per chain build.
+_SYSTEM_MESSAGE = SystemMessage(content=_SYSTEM_INSTRUCTION)
+
+
+# Reused validator — building it per parse re-dispatches through
+# pydantic-core setup; one instance serves every call and any future
+# batch validation.
+_DISCOVERY_ADAPTER = TypeAdapter(LegalDiscovery)
 
 
+def _parse_fallback(error: Exception) -> LegalDiscovery:
+    # Human-like fallback for errors. model_construct skips validation —
+    # the data below is authored right here, so re-validating it would be
+    # pure overhead on the error path.
+    return LegalDiscovery.model_construct(
+        is_legal_document=False,
+        document_type="Unknown",
+        parties=[],
+        complex_terms=[{"term": "Error", "definition": "Could not parse JSON"}],
+        key_obligations=[],
+        hidden_risks=[str(error)]
+    )
+
 def clean_json_text(text: str) -> str:
     """
-    Finds the outermost { } block. 
+    Finds the outermost { } block via two anchor scans — str.find/rfind
+    run as C memchr-style loops, so this is one O(n) pass with no regex
+    engine and no backtracking. Fenced output needs no special handling:
+    the braces inside a ```json fence are still the outermost braces.
     Prevents crashes from 'Here is the JSON:' conversational filler.
     """
-    try:
-        match = re.search(r"\{.*\}", text, re.DOTALL)
-        return match.group(0) if match else text
-    except:
-        return text
+    start = text.find("{")
+    end = text.rfind("}")
+    if start != -1 and end > start:
+        return text[start:end + 1]
+    return text
 
-def get_discovery_agent():
-    """
-    Discovery agent that replaces the rigid extractor with a cognitive one.
-    """
-    parser = PydanticOutputParser(pydantic_object=LegalDiscovery)
-    llm = get_model(temperature=0) # Low temp for high accuracy in discovery
-
-    system_instruction = (
-        "You are a Senior Legal Counsel. Your first task is to determine if the text is a legal document. "
-        "If it is, perform a deep discovery of its substance. "
-        "Identify complex 'legalese' terms and provide simple translations. "
-        "Expose the hidden risks that a layman might miss. "
-        "You MUST return ONLY a JSON object."
-    )
+@lru_cache(maxsize=4)
+def _build_discovery_agent(use_local: bool):
+    """Compile the prompt/LLM chain once per (local|cloud) mode."""
+    llm = get_model(temperature=0, role="extractor") # Low temp for high accuracy in discovery
 
-    if os.getenv("USE_LOCAL_AI") == "true":
+    if use_local:
         prompt = ChatPromptTemplate.from_messages([
-            ("system", system_instruction),
+            _SYSTEM_MESSAGE,
             ("user", "Analyze this text: {contract_text}\n\nFormat: {format_instructions}")
-        ]).partial(format_instructions=parser.get_format_instructions())
+        ]).partial(format_instructions=_FORMAT_INSTRUCTIONS)
+        chain = prompt | llm
 
         def local_chain(input_data):
-            raw_response = (prompt | llm).invoke(input_data)
-            content = raw_response.content if isinstance(raw_response, BaseMessage) else str(raw_response)
+            # Stream and stop once the JSON object closes — no need to
+            # wait out trailing filler tokens or rescan the full buffer.
+            content = stream_json_response(chain, input_data)
             sanitized_json = clean_json_text(content) # type: ignore
-            try:
-                return parser.parse(sanitized_json)
-            except Exception as e:
-                # Human-like fallback for errors
-                return LegalDiscovery(
-                    is_legal_document=False,
-                    document_type="Unknown",
-                    parties=[],
-                    complex_terms=[{"term": "Error", "definition": "Could not parse JSON"}],
-                    key_obligations=[],
-                    hidden_risks=[str(e)]
-                )
-        return local_chain
+            # Decode straight into the model — skips the parser's extra
+            # json.loads pass and uses pydantic-core's fast JSON path.
+            # Parse failures raise past the cache; the fallback below is
+            # built outside it so it is never replayed for this contract.
+            return _DISCOVERY_ADAPTER.validate_json(sanitized_json)
+        return CachedAgent(
+            local_chain, "discovery|local|" + _SYSTEM_INSTRUCTION,
+            fallback=_parse_fallback,
+        )
 
     else:
-        # Cloud Logic: Uses structured output
+        # Cloud Logic: try a plain call first, structured output as fallback
         prompt = ChatPromptTemplate.from_messages([
-            ("system", system_instruction),
+            _SYSTEM_MESSAGE,
             ("user", "Contract Content:\n{contract_text}")
         ])
-        return prompt | llm.with_structured_output(LegalDiscovery)
+        chain = StructuredOutputShortCircuit(prompt, llm, LegalDiscovery, clean_json_text)
+        return CachedAgent(chain, "discovery|cloud|" + _SYSTEM_INSTRUCTION)
+
+
+def get_discovery_agent():
+    """
+    Discovery agent that replaces the rigid extractor with a cognitive one.
+    The compiled chain is cached — rebuilding prompts, parsers, and LLM
+    clients per call was pure overhead on every document.
+    """
+    return _build_discovery_agent(os.getenv("USE_LOCAL_AI") == "true")
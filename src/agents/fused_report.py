@@ -0,0 +1,90 @@
+import os
+from functools import lru_cache
+from pydantic import BaseModel
+from .get_model import get_model
+from .structured import StructuredOutputShortCircuit
+from .response_cache import CachedAgent
+from .extractor import clean_json_text
+from .analyzer import _PLAYBOOK
+from .schemas import LegalDiscovery, LegalAnalysis, ExecutiveSummary
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import BaseMessage, SystemMessage
+
+
+class FullLegalReport(BaseModel):
+    """Discovery + analysis + summary fused into one LLM response."""
+    discovery: LegalDiscovery
+    analysis: LegalAnalysis
+    final_summary: ExecutiveSummary
+
+
+# Compact, hand-written shape hint like the per-stage agents use —
+# PydanticOutputParser's generated instructions dumped the full nested
+# FullLegalReport schema ($defs and every description) into each
+# local-mode prompt, and the bytes shift across pydantic versions,
+# breaking provider prefix caches. The Pydantic model still validates
+# the parsed output.
+_FORMAT_INSTRUCTIONS = (
+    'Respond with a JSON object exactly like this:\n'
+    '{"discovery": {"is_legal_document": true, "document_type": "Employment Agreement", '
+    '"parties": ["Acme Corp", "Jane Smith"], '
+    '"complex_terms": [{"term": "Indemnification", "definition": "You cover their losses"}], '
+    '"key_obligations": ["..."], "hidden_risks": ["..."]}, '
+    '"analysis": {"pros": ["..."], '
+    '"cons": [{"category": "Non-compete", "severity": "High", '
+    '"clause_reference": "...", "explanation": "...", "suggestion": "..."}], '
+    '"verdict": "Negotiate", "summary": "..."}, '
+    '"final_summary": {"tldr": "...", '
+    '"key_takeaways": [{"title": "...", "simple_explanation": "...", "action_item": "..."}], '
+    '"coaches_tip": "...", "tone_check": "..."}}'
+)
+
+_SYSTEM_INSTRUCTION = (
+    "You are a Senior Legal Counsel and Career Coach producing a complete report in one pass.\n"
+    "1. DISCOVERY: Determine if this is a legal document; identify its type, parties, "
+    "complex 'legalese' terms with simple translations, key obligations, and hidden risks.\n"
+    f"2. ANALYSIS: Assess risks against this Playbook:\n{_PLAYBOOK}\n"
+    "Provide pros, detailed cons, and a verdict ('Sign', 'Negotiate', or 'Walk Away').\n"
+    "3. SUMMARY: Translate everything into a warm, empowering brief for a layman — "
+    "no jargon, with concrete action items and a supportive coach's tip.\n"
+    "You MUST return ONLY a JSON object with 'discovery', 'analysis', and 'final_summary' keys."
+)
+
+# Prebuilt message: skips per-call template rendering of the static block.
+_SYSTEM_MESSAGE = SystemMessage(content=_SYSTEM_INSTRUCTION)
+
+
+@lru_cache(maxsize=4)
+def _build_fused_agent(use_local: bool):
+    """Compile the fused prompt/LLM chain once per (local|cloud) mode."""
+    llm = get_model(temperature=0, role="analyzer")
+
+    if use_local:
+        prompt = ChatPromptTemplate.from_messages([
+            _SYSTEM_MESSAGE,
+            ("user", "Analyze this text: {contract_text}\n\nFormat: {format_instructions}")
+        ]).partial(format_instructions=_FORMAT_INSTRUCTIONS)
+        chain = prompt | llm
+
+        def local_chain(input_data):
+            raw_response = chain.invoke(input_data)
+            content = raw_response.content if isinstance(raw_response, BaseMessage) else str(raw_response)
+            return FullLegalReport.model_validate_json(clean_json_text(content))
+        return CachedAgent(local_chain, "fused|local|" + _SYSTEM_INSTRUCTION)
+
+    else:
+        prompt = ChatPromptTemplate.from_messages([
+            _SYSTEM_MESSAGE,
+            ("user", "Contract Content:\n{contract_text}")
+        ])
+        chain = StructuredOutputShortCircuit(prompt, llm, FullLegalReport, clean_json_text)
+        return CachedAgent(chain, "fused|cloud|" + _SYSTEM_INSTRUCTION)
+
+
+def get_fused_agent():
+    """
+    Single-call agent for short contracts. For documents dominated by the
+    fixed system prompts, three serial LLM round-trips triple both latency
+    and prompt-token billing; fusing them collapses that to one call.
+    """
+    return _build_fused_agent(os.getenv("USE_LOCAL_AI") == "true")
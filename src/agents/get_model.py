@@ -1,31 +1,124 @@
 import os
+from functools import lru_cache
 from typing import Union
-from langchain_ollama import ChatOllama
-from langchain_deepseek import ChatDeepSeek
 
+# The provider integrations are imported lazily inside get_model: each one
+# drags in hundreds of transitive modules (httpx, tokenizers, pydantic
+# validators), and any given process only ever uses one branch. Keeping
+# them out of module scope cuts cold-start for CLI entry points like
+# generate_graph.py.
 
-def get_model(
-    model=None,
-    format=None,
-    temperature: Union[int, float] = 0.7,
-    structured: bool = False
-):
-    if os.getenv("USE_LOCAL_AI") == "true":
+# How long Ollama should keep the model pinned in memory between calls.
+# Without this, a quiet period means the next request pays a multi-second
+# weight reload before the first token.
+_OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+_OLLAMA_MODEL = "deepseek-v3.1:671b-cloud" # "deepseek-v3.2:cloud",
+
+_warmed = False
+
+# Shared HTTP clients for the DeepSeek path. Each ChatDeepSeek instance
+# otherwise builds its own pool, paying TCP+TLS handshakes per agent under
+# concurrent orchestration. Built lazily on first cloud-model request.
+_shared_clients = None
+
+
+def _get_shared_clients():
+    global _shared_clients
+    if _shared_clients is None:
+        import httpx
+
+        limits = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+        try:
+            # HTTP/2 multiplexes concurrent agent calls over one connection;
+            # falls back cleanly if the optional h2 package is absent.
+            sync_client = httpx.Client(http2=True, limits=limits)
+            async_client = httpx.AsyncClient(http2=True, limits=limits)
+        except ImportError:
+            sync_client = httpx.Client(limits=limits)
+            async_client = httpx.AsyncClient(limits=limits)
+        _shared_clients = (sync_client, async_client)
+    return _shared_clients
+
+
+def _warm_ollama(base_url: str) -> None:
+    """Fire one empty generate request so the model is loaded and pinned
+    before the first real call. Best-effort: a dead Ollama just means the
+    real call pays the cold start as before."""
+    global _warmed
+    if _warmed:
+        return
+    _warmed = True
+    try:
+        import httpx
+        httpx.post(
+            base_url.rstrip("/") + "/api/generate",
+            json={"model": _OLLAMA_MODEL, "prompt": "", "keep_alive": _OLLAMA_KEEP_ALIVE},
+            timeout=5,
+        )
+    except Exception:
+        pass
+
+
+# Structured rule-matching and field extraction don't need chain-of-thought;
+# reasoner models burn many hidden tokens before answering. Route those
+# roles to the cheaper non-reasoning model and keep the reasoner for the
+# synthesis work that benefits from it.
+_ROLE_MODELS = {
+    "extractor": "deepseek-chat",
+    "analyzer": "deepseek-chat",
+    "translator": "deepseek-reasoner",
+}
+
+
+@lru_cache(maxsize=16)
+def _build_model(use_local: bool, model, temperature, json_mode: bool, role):
+    """Construct a chat model once per distinct configuration.
+
+    Client construction runs pydantic validation and HTTP plumbing setup;
+    nodes call get_model per invocation, so identical configurations
+    share one instance (the underlying clients are safe for concurrent
+    calls)."""
+    if use_local:
+        from langchain_ollama import ChatOllama
+
+        base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/")
+        _warm_ollama(base_url)
+
+        # json_mode is an explicit opt-in: Ollama's JSON grammar mode masks
+        # every sampled token against a grammar and slows generation down
+        # massively, and the agents already do two-stage parsing (free-form
+        # decode -> clean_json_text -> parse). Nothing in this codebase
+        # should pass json_mode=True without a measured reason.
         ollama = ChatOllama(
-            base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/"),
-            model="deepseek-v3.1:671b-cloud", # "deepseek-v3.2:cloud",
+            base_url=base_url,
+            model=_OLLAMA_MODEL,
             temperature=temperature,
-            format=format if format else None,
+            keep_alive=_OLLAMA_KEEP_ALIVE,
+            format="json" if json_mode else None,
         )
 
         return ollama
-    
+
     else:
+        from langchain_deepseek import ChatDeepSeek
+
+        http_client, http_async_client = _get_shared_clients()
         deepseek = ChatDeepSeek(
-            model=model or "deepseek-reasoner",
+            model=model or _ROLE_MODELS.get(role, "deepseek-reasoner"),
             api_key=os.getenv("DEEPSEEK_API_KEY", ""),
             temperature=temperature,
+            http_client=http_client,
+            http_async_client=http_async_client,
         )
-        if structured:
-            pass
         return deepseek
+
+
+def get_model(
+    model=None,
+    temperature: Union[int, float] = 0.7,
+    json_mode: bool = False,
+    role: str = None
+):
+    return _build_model(
+        os.getenv("USE_LOCAL_AI") == "true", model, temperature, json_mode, role
+    )
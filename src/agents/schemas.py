@@ -0,0 +1,96 @@
+"""
+Canonical home for the agents' Pydantic response models.
+
+Each BaseModel subclass pays schema, validator-core, and JSON-encoder
+construction at class-creation time, so the models are defined exactly
+once here and imported by every agent instead of being re-declared per
+module.
+"""
+
+from enum import Enum
+from typing import List, Dict
+from pydantic import BaseModel, Field
+
+
+class Severity(str, Enum):
+    HIGH = "High"
+    MEDIUM = "Medium"
+    LOW = "Low"
+
+    @classmethod
+    def _missing_(cls, value):
+        # Models occasionally shout ("HIGH") or pad ("high risk"); only
+        # the miss path pays for this normalization.
+        if isinstance(value, str):
+            folded = value.strip().lower()
+            for member in cls:
+                if folded.startswith(member.value.lower()):
+                    return member
+        return None
+
+
+class Verdict(str, Enum):
+    SIGN = "Sign"
+    NEGOTIATE = "Negotiate"
+    WALK_AWAY = "Walk Away"
+
+    @classmethod
+    def _missing_(cls, value):
+        if isinstance(value, str):
+            folded = value.strip().lower()
+            for member in cls:
+                if folded.startswith(member.value.lower()):
+                    return member
+        return None
+
+
+class LegalDiscovery(BaseModel):
+    is_legal_document: bool = Field(description="Is this actually a legal document?")
+    document_type: str = Field(description="The specific type of agreement identified")
+    parties: List[str] = Field(default_factory=list, description="Entities involved")
+    complex_terms: List[Dict[str, str]] = Field(
+        description="List of jargon terms (e.g., 'Indemnification') and their simple layman definitions"
+    )
+    key_obligations: List[str] = Field(description="What the user is actually required to do")
+    hidden_risks: List[str] = Field(description="Subtle traps found in the fine print")
+
+
+class RiskItem(BaseModel):
+    category: str = Field(description="e.g., Non-compete, IP Ownership, Liability")
+    severity: Severity = Field(description="High, Medium, or Low")
+    clause_reference: str = Field(description="The snippet or section found")
+    explanation: str = Field(description="Human-like explanation of why this matters to the user's career")
+    suggestion: str = Field(description="Specific professional advice for negotiation")
+
+
+class LegalAnalysis(BaseModel):
+    pros: List[str] = Field(default_factory=list, description="Positive aspects for the user")
+    cons: List[RiskItem] = Field(default_factory=list, description="Detailed professional risks")
+    verdict: Verdict = Field(description="Senior Counsel's final recommendation: 'Sign', 'Negotiate', or 'Walk Away'")
+    summary: str = Field(description="A empathetic 2-sentence takeaway for a layman")
+
+
+class SimplifiedSection(BaseModel):
+    title: str = Field(description="The human-friendly topic name")
+    simple_explanation: str = Field(description="What this means for your daily life, in plain English")
+    action_item: str = Field(description="What you should actually do or say next")
+
+
+class ExecutiveSummary(BaseModel):
+    tldr: str = Field(description="A warm, empathetic 2-sentence summary of the situation")
+    key_takeaways: List[SimplifiedSection]
+    coaches_tip: str = Field(description="An 'insider' tip on how to handle this specific deal human-to-human")
+    tone_check: str = Field(description="A descriptive mood (e.g., 'Aggressively One-sided' or 'Fair & Collaborative')")
+
+
+class UnifiedLegalResponse(BaseModel):
+    is_legal: bool
+    doc_type: str
+
+    # We now ask for Markdown-formatted strings
+    briefing_md: str = Field(description="Markdown: A warm, empathetic briefing with headers and bold text.")
+    glossary_md: str = Field(description="Markdown: List of complex terms defined simply.")
+    risks_md: str = Field(description="Markdown: A numbered list of risks with severity and advice.")
+
+    verdict: str # Keep this as a single word for the UI tag
+    coaches_tip_md: str = Field(description="Markdown: A supportive 'insider' tip.")
@@ -0,0 +1,135 @@
+from langchain_core.messages import BaseMessage
+
+
+class JsonObjectTracker:
+    """
+    Incremental scanner for streamed LLM output.
+
+    Feed it chunks as they arrive; it tracks brace depth with an
+    escape-aware string state machine and reports once the first
+    top-level JSON object has closed. Each character is examined exactly
+    once, so the caller can stop pulling tokens the moment the object is
+    complete instead of buffering the whole response and regex-scanning
+    it afterwards.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.done = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> bool:
+        if self.done:
+            return True
+        for ch in chunk:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self.started = True
+                self._depth += 1
+            elif ch == "}" and self.started:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+                    return True
+        return False
+
+
+def extract_json_object(text: str) -> str:
+    """
+    Return the first balanced top-level JSON object in `text`.
+
+    Single forward pass with an escape-aware string state machine — O(n)
+    with no regex backtracking, and immune to braces inside markdown
+    content in string fields (which defeat a greedy `\\{.*\\}` scan).
+    Falls back to the original text when no object is found.
+    """
+    start = text.find("{")
+    if start == -1:
+        return text
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    # Unterminated object (truncated output) — return what we have.
+    return text[start:]
+
+
+def stream_json_response(chain, input_data) -> str:
+    """
+    Stream a chain's output, stopping as soon as a complete top-level
+    JSON object has been received. Saves the tail of the generation
+    (trailing prose, padding tokens) and overlaps parsing bookkeeping
+    with network transfer.
+    """
+    tracker = JsonObjectTracker()
+    pieces = []
+    for chunk in chain.stream(input_data):
+        piece = chunk.content if isinstance(chunk, BaseMessage) else str(chunk)
+        if piece:
+            pieces.append(piece)
+            if tracker.feed(piece):
+                break
+    return "".join(pieces)
+
+
+class StructuredOutputShortCircuit:
+    """
+    Avoids redundant structured-output LLM calls on the cloud path.
+
+    with_structured_output can cost an extra tool-call round-trip (or a
+    provider-side retry) even when the model's raw text already contains
+    clean JSON. This wrapper runs the plain prompt | llm chain first and
+    decodes the text directly into the target model; only if that fails
+    does it fall back to the provider's structured-output machinery.
+    """
+
+    def __init__(self, prompt, llm, model_cls, clean_fn):
+        self._fast_chain = prompt | llm
+        self._fallback_chain = prompt | llm.with_structured_output(model_cls)
+        self._model_cls = model_cls
+        self._clean_fn = clean_fn
+
+    def invoke(self, input_data):
+        try:
+            raw = self._fast_chain.invoke(input_data)
+            content = raw.content if isinstance(raw, BaseMessage) else str(raw)
+            return self._model_cls.model_validate_json(self._clean_fn(content))
+        except Exception:
+            # Malformed or truncated JSON — pay for the structured call.
+            return self._fallback_chain.invoke(input_data)
+
+    async def ainvoke(self, input_data):
+        try:
+            raw = await self._fast_chain.ainvoke(input_data)
+            content = raw.content if isinstance(raw, BaseMessage) else str(raw)
+            return self._model_cls.model_validate_json(self._clean_fn(content))
+        except Exception:
+            return await self._fallback_chain.ainvoke(input_data)
@@ -1,69 +1,90 @@
 import os
 import re
-from pydantic import BaseModel, Field
-from typing import List
+from functools import lru_cache
 from .get_model import get_model
+from .schemas import ExecutiveSummary
+from .structured import extract_json_object
+from .response_cache import mark_fallback
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import BaseMessage, SystemMessage
 
 
-class SimplifiedSection(BaseModel):
-    title: str = Field(description="The human-friendly topic name")
-    simple_explanation: str = Field(description="What this means for your daily life, in plain English")
-    action_item: str = Field(description="What you should actually do or say next")
+# Hand-written shape example instead of PydanticOutputParser's generated
+# schema block: a fraction of the tokens, and byte-stable across pydantic
+# versions so the prompt prefix stays cacheable.
+_FORMAT_INSTRUCTIONS = (
+    'Return ONLY a JSON object shaped exactly like this example:\n'
+    '{"tldr": "...", '
+    '"key_takeaways": [{"title": "...", "simple_explanation": "...", "action_item": "..."}], '
+    '"coaches_tip": "...", "tone_check": "..."}'
+)
 
+# Compiled once; re.sub with a string pattern re-checks the pattern cache
+# on every call, and this runs on every local-mode response.
+_FENCE_RE = re.compile(r"```json\s*|\s*```")
 
-class ExecutiveSummary(BaseModel):
-    tldr: str = Field(description="A warm, empathetic 2-sentence summary of the situation")
-    key_takeaways: List[SimplifiedSection]
-    coaches_tip: str = Field(description="An 'insider' tip on how to handle this specific deal human-to-human")
-    tone_check: str = Field(description="A descriptive mood (e.g., 'Aggressively One-sided' or 'Fair & Collaborative')")
+_SYSTEM_INSTRUCTION = (
+    "You are a warm, expert Legal Career Coach. "
+    "Your goal is to make the user feel empowered, not overwhelmed. "
+    "Translate the complex discovery and legal analysis into a supportive brief. "
+    "Use analogies where helpful and avoid all legal jargon. "
+    "If you see a risk, explain it as a 'protection' the user deserves. "
+    "You MUST return ONLY a JSON object."
+)
+
+# Prebuilt message object: the system turn is fully static, so sending
+# the identical bytes every call lets DeepSeek's automatic prefix cache
+# serve it without re-processing (the dynamic analysis stays in the user
+# turn, after the cacheable prefix).
+_SYSTEM_MESSAGE = SystemMessage(content=_SYSTEM_INSTRUCTION)
 
 
 def clean_json_text(text: str) -> str:
-    text = re.sub(r"```json\s*|\s*```", "", text)
-    match = re.search(r"\{.*\}", text, re.DOTALL)
-    return match.group(0) if match else text
+    text = _FENCE_RE.sub("", text)
+    return extract_json_object(text)
 
-def get_translator_agent():
-    parser = PydanticOutputParser(pydantic_object=ExecutiveSummary)
+@lru_cache(maxsize=4)
+def _build_translator_agent(use_local: bool):
+    """Compile the prompt/LLM chain once per (local|cloud) mode."""
     # 0.5 temperature allows for more natural, varied human language
-    llm = get_model(temperature=0.5)
-
-    system_instruction = (
-        "You are a warm, expert Legal Career Coach. "
-        "Your goal is to make the user feel empowered, not overwhelmed. "
-        "Translate the complex discovery and legal analysis into a supportive brief. "
-        "Use analogies where helpful and avoid all legal jargon. "
-        "If you see a risk, explain it as a 'protection' the user deserves. "
-        "You MUST return ONLY a JSON object."
-    )
+    llm = get_model(temperature=0.5, role="translator")
 
-    if os.getenv("USE_LOCAL_AI") == "true":
+    if use_local:
         prompt = ChatPromptTemplate.from_messages([
-            ("system", system_instruction),
+            _SYSTEM_MESSAGE,
             ("user", "Analysis to Simplify: {analysis_json}\n\nFormat as JSON: {format_instructions}")
-        ]).partial(format_instructions=parser.get_format_instructions())
+        ]).partial(format_instructions=_FORMAT_INSTRUCTIONS)
+        chain = prompt | llm
 
         def local_chain(input_data):
-            raw_response = (prompt | llm).invoke(input_data)
+            raw_response = chain.invoke(input_data)
             content = raw_response.content if isinstance(raw_response, BaseMessage) else str(raw_response)
             try:
                 sanitized_json = clean_json_text(content) # type: ignore
-                return parser.parse(sanitized_json)
+                # model_validate_json decodes straight from the string via
+                # pydantic-core's jiter-backed parser — no intermediate
+                # json.loads dict pass like PydanticOutputParser.parse.
+                return ExecutiveSummary.model_validate_json(sanitized_json)
             except Exception as e:
-                return ExecutiveSummary(
+                # Literal fallback values are known-good; model_construct
+                # skips the validation pass a normal constructor would run.
+                # Marked so the node-level cache never stores this reply.
+                return mark_fallback(ExecutiveSummary.model_construct(
                     tldr="I'm having a little trouble summarizing this, but let's look at the details together.",
                     key_takeaways=[],
                     coaches_tip="Take a breath and read the sections below carefully.",
                     tone_check="Undetermined"
-                )
+                ))
         return local_chain
     else:
         # Cloud logic (GPT/DeepSeek)
         prompt = ChatPromptTemplate.from_messages([
-            ("system", system_instruction),
+            _SYSTEM_MESSAGE,
             ("user", "Analysis to Simplify: {analysis_json}")
         ])
-        return prompt | llm.with_structured_output(ExecutiveSummary)
\ No newline at end of file
+        return prompt | llm.with_structured_output(ExecutiveSummary)
+
+
+def get_translator_agent():
+    """Translator agent with the compiled chain cached across calls."""
+    return _build_translator_agent(os.getenv("USE_LOCAL_AI") == "true")
@@ -1,71 +1,94 @@
+import json
 import os
-import re
-from pydantic import BaseModel, Field
-from typing import List, Dict
+from functools import lru_cache
+
+import jiter
 from .get_model import get_model
+from .schemas import UnifiedLegalResponse
+from .structured import extract_json_object
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.messages import SystemMessage
+
+
+# Compact schema hint built once at import. PydanticOutputParser's
+# get_format_instructions() wraps the schema in a verbose preamble that
+# costs input tokens on every call; a tight one-line schema dump carries
+# the same information.
+_FORMAT_INSTRUCTIONS = (
+    "Return ONLY a JSON object matching this schema (no prose, no markdown fences):\n"
+    + json.dumps(UnifiedLegalResponse.model_json_schema(), separators=(",", ":"))
+)
 
+# THE MASTER PROMPT
+_MASTER_INSTRUCTION = (
+    "You are a Senior Legal Counsel and Career Coach. "
+    "Analyze the provided text in a single pass to: "
+    "1. VALIDATE: Determine if this is a legal document. "
+    "2. DISCOVER: Identify complex jargon and define it for a layman. "
+    "3. ANALYZE: Apply a risk playbook (Non-competes > 6mo = High Risk, Notice > 3mo = Medium). "
+    "4. COACH: Provide a verdict (Sign/Negotiate/Walk) and a supportive tip. "
+    "Format each field using Markdown. Use ### for headers, * for bullet points, and ** for emphasis. Do not use JSON keys inside these fields; provide a human-readable narrative."
+    "Write in warm, professional, yet approachable tone — like a trusted senior lawyer speaking directly to a founder or early-career professional."
+"Use short paragraphs. Prefer active voice. Never write like a robot or use bullet lists inside JSON strings — only use markdown lists when they improve readability."
+"""Make section transitions feel natural (e.g. "Now let's look at the main risks..." or "A few important terms you should understand:")."""
+)
 
-class UnifiedLegalResponse(BaseModel):
-    is_legal: bool 
-    doc_type: str
-    
-    # We now ask for Markdown-formatted strings
-    briefing_md: str = Field(description="Markdown: A warm, empathetic briefing with headers and bold text.")
-    glossary_md: str = Field(description="Markdown: List of complex terms defined simply.")
-    risks_md: str = Field(description="Markdown: A numbered list of risks with severity and advice.")
-    
-    verdict: str # Keep this as a single word for the UI tag
-    coaches_tip_md: str = Field(description="Markdown: A supportive 'insider' tip.")
+# Static system turn as a prebuilt message: identical bytes each call keep
+# DeepSeek's automatic prefix cache warm, so only the {contract_text}
+# user-turn suffix is re-processed per document.
+_SYSTEM_MESSAGE = SystemMessage(content=_MASTER_INSTRUCTION)
 
 
 def clean_json_text(text: str) -> str:
     """
-    Finds the outermost { } block. 
+    Finds the outermost { } block.
     Prevents crashes from 'Here is the JSON:' conversational filler.
     """
     try:
-        match = re.search(r"\{.*\}", text, re.DOTALL)
-        return match.group(0) if match else text
+        return extract_json_object(text)
     except:
         return text
 
-def get_unified_agent():
-    parser = PydanticOutputParser(pydantic_object=UnifiedLegalResponse)
-    llm = get_model(temperature=0)
-
-    # THE MASTER PROMPT
-    master_instruction = (
-        "You are a Senior Legal Counsel and Career Coach. "
-        "Analyze the provided text in a single pass to: "
-        "1. VALIDATE: Determine if this is a legal document. "
-        "2. DISCOVER: Identify complex jargon and define it for a layman. "
-        "3. ANALYZE: Apply a risk playbook (Non-competes > 6mo = High Risk, Notice > 3mo = Medium). "
-        "4. COACH: Provide a verdict (Sign/Negotiate/Walk) and a supportive tip. "
-        "Format each field using Markdown. Use ### for headers, * for bullet points, and ** for emphasis. Do not use JSON keys inside these fields; provide a human-readable narrative."
-        "Write in warm, professional, yet approachable tone — like a trusted senior lawyer speaking directly to a founder or early-career professional."
-"Use short paragraphs. Prefer active voice. Never write like a robot or use bullet lists inside JSON strings — only use markdown lists when they improve readability."
-"""Make section transitions feel natural (e.g. "Now let's look at the main risks..." or "A few important terms you should understand:")."""
-    )
+@lru_cache(maxsize=4)
+def _build_unified_agent(use_local: bool):
+    """Compile the prompt/LLM chain once per (local|cloud) mode."""
+    llm = get_model(temperature=0, role="analyzer")
 
-    if os.getenv("USE_LOCAL_AI") == "true":
+    if use_local:
         prompt = ChatPromptTemplate.from_messages([
-            ("system", master_instruction),
+            _SYSTEM_MESSAGE,
             ("user", "Document: {contract_text}\n\nFormat: {format_instructions}")
-        ]).partial(format_instructions=parser.get_format_instructions())
+        ]).partial(format_instructions=_FORMAT_INSTRUCTIONS)
+        chain = prompt | llm
 
         def local_chain(input_text):
-            response = (prompt | llm).invoke({"contract_text": input_text})
-            # Use the cleaning utility we built earlier
-            content = clean_json_text(response.content) 
-            return parser.parse(content)
+            response = chain.invoke({"contract_text": input_text})
+            content = response.content
+            start = content.find("{")
+            try:
+                # jiter parses the first object straight off the byte
+                # stream in one pass; partial mode tolerates trailing
+                # prose and truncated tails without any pre-scanning.
+                parsed = jiter.from_json(
+                    content[start:].encode(), partial_mode=True
+                )
+                return UnifiedLegalResponse.model_validate(parsed)
+            except Exception:
+                # Fall back to the balanced-brace extractor.
+                return UnifiedLegalResponse.model_validate_json(
+                    clean_json_text(content)
+                )
         return local_chain
 
     else:
         # Cloud Logic: Uses structured output
         prompt = ChatPromptTemplate.from_messages([
-            ("system", master_instruction),
+            _SYSTEM_MESSAGE,
             ("user", "Contract Content:\n{contract_text}")
         ])
         return prompt | llm.with_structured_output(UnifiedLegalResponse)
+
+
+def get_unified_agent():
+    """Unified single-pass agent with the compiled chain cached across calls."""
+    return _build_unified_agent(os.getenv("USE_LOCAL_AI") == "true")
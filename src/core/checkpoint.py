@@ -0,0 +1,54 @@
+"""
+Bounded checkpoint storage for long-running server processes.
+
+LangGraph's InMemorySaver keeps every thread's checkpoints forever, so a
+server that analyzes documents for weeks grows RSS without limit. This
+saver adds LRU eviction over thread ids on top of the stock
+implementation — the serialization format and all read paths stay
+langgraph's own (checkpoints hold live message objects, which the
+built-in serde already handles; re-encoding them through a JSON codec
+would break tool-call messages).
+"""
+
+import os
+from collections import OrderedDict
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+# Upper bound on concurrently retained conversation threads. Each thread
+# holds the full message history plus analysis models, so a few hundred
+# is already generous for a single process.
+_DEFAULT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "256"))
+
+
+class BoundedInMemorySaver(InMemorySaver):
+    """InMemorySaver that evicts the least-recently-used threads."""
+
+    def __init__(self, maxsize: int = _DEFAULT_MAX_THREADS, **kwargs):
+        super().__init__(**kwargs)
+        self.maxsize = maxsize
+        self._recency: OrderedDict = OrderedDict()
+
+    def _touch(self, thread_id) -> None:
+        self._recency[thread_id] = None
+        self._recency.move_to_end(thread_id)
+
+    def _evict(self) -> None:
+        while len(self._recency) > self.maxsize:
+            evicted, _ = self._recency.popitem(last=False)
+            self.storage.pop(evicted, None)
+            stale = [key for key in self.writes if key[0] == evicted]
+            for key in stale:
+                del self.writes[key]
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        self._touch(config["configurable"]["thread_id"])
+        self._evict()
+        return result
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"].get("thread_id")
+        if thread_id in self._recency:
+            self._touch(thread_id)
+        return super().get_tuple(config)
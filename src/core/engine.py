@@ -1,17 +1,31 @@
-import uuid
+from __future__ import annotations
+
+import asyncio
+import os
+from functools import cache, lru_cache
+
+import xxhash
+
+import orjson
 from typing import Annotated, List, Literal, TypedDict, Optional
 
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage
 from langgraph.graph.message import add_messages
 
 from src.agents.extractor import get_discovery_agent
 from src.agents.analyzer import get_analyzer_agent
 from src.agents.translator import get_translator_agent
+from src.agents.fused_report import get_fused_agent
 from src.agents.get_model import get_model
-from src.core.rag_pipeline import LegalRAG
+from src.agents.schemas import LegalDiscovery, LegalAnalysis, ExecutiveSummary
+from src.core.rag_pipeline import LegalRAG, rag_engine
+from src.core.llm_cache import get_or_compute
+from src.core.checkpoint import BoundedInMemorySaver
+from src.core.semantic_cache import SemanticCache
+from src.utils.cache import TTLCache
+from src.utils.truncate import fit_to_tokens
 
 
 # ----------------------------------------------------------------------
@@ -19,10 +33,19 @@ from src.core.rag_pipeline import LegalRAG
 # ----------------------------------------------------------------------
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], add_messages]
+    # Fallback only — full document text normally lives in the
+    # thread-keyed side table below so the checkpointer never copies it.
     raw_text: str
-    discovery: Optional[dict]
-    analysis: Optional[dict]
-    final_summary: Optional[dict]
+    # Fallback only — the prompt-bound prefix normally lives in the side
+    # table too; routing it through state made the checkpointer copy up
+    # to PROMPT_MAX_TOKENS of text per superstep and leaked the document
+    # into the validator's streamed update.
+    truncated_text: Optional[str]
+    # Model objects travel through state as-is; they are serialized exactly
+    # once, at the prompt boundary (and by the SSE layer on the way out).
+    discovery: Optional[LegalDiscovery]
+    analysis: Optional[LegalAnalysis]
+    final_summary: Optional[ExecutiveSummary]
     mode: Literal["analyze", "chat"]  # Controls entry path
     is_legal: bool
     errors: List[str]
@@ -31,114 +54,388 @@ class AgentState(TypedDict):
 # ----------------------------------------------------------------------
 # Global Resources
 # ----------------------------------------------------------------------
-rag_engine = LegalRAG()
-rag_tool = rag_engine.as_tool()  # Tool instantiated once
+def _rag() -> LegalRAG:
+    # Process-wide shared pipeline — one embedding model and one vector
+    # store no matter how many modules import an engine.
+    return rag_engine
+
+
+@cache
+def _rag_tool():
+    return _rag().as_tool()  # Tool instantiated once
+
+
+# Heavy document text stays out of graph state: LangGraph copies the
+# state dict on every reducer update and the checkpointer re-serializes
+# it at each node boundary, so a 30k-char raw_text was duplicated per
+# step. The side table mirrors the SSE layer's doc_store (bounded,
+# expiring, internally locked); nodes resolve text by thread_id and fall
+# back to the state field for direct invocations.
+_RAW_TEXT_STORE = TTLCache(maxsize=512, ttl_seconds=3600)
+# The validator's token-bounded prefix, kept alongside the raw text for
+# the same reason: it is document content, not node output.
+_TRUNCATED_STORE = TTLCache(maxsize=512, ttl_seconds=3600)
+
+
+def put_raw_text(thread_id: str, text: str) -> None:
+    """Register a document's anonymized text for a thread before invoking."""
+    _RAW_TEXT_STORE[thread_id] = text
+
+
+def _thread_id(config):
+    return (config or {}).get("configurable", {}).get("thread_id")
+
+
+def _raw_text(state: AgentState, config) -> str:
+    thread_id = _thread_id(config)
+    if thread_id is not None:
+        text = _RAW_TEXT_STORE.get(thread_id)
+        if text is not None:
+            return text
+    return state.get("raw_text") or ""
+
+
+def _truncated_text(state: AgentState, config) -> str:
+    thread_id = _thread_id(config)
+    if thread_id is not None:
+        text = _TRUNCATED_STORE.get(thread_id)
+        if text is not None:
+            return text
+    return state.get("truncated_text") or ""
 
 
 # ----------------------------------------------------------------------
 # Nodes
 # ----------------------------------------------------------------------
-def validator_node(state: AgentState) -> dict:
-    """Initial validation: Check if the document is legal."""
-    llm = get_model(temperature=0)
-    prompt = f"""You are a legal gatekeeper. Analyze the following text snippet.
-    Is this a legal document (contract, NDA, lease, etc.)? 
-    Respond with exactly one word: 'YES' or 'NO'.
-    
-    TEXT: {state['raw_text'][:2000]}"""
-    
-    response = llm.invoke(prompt)
-    is_legal = "YES" in response.content.upper()
-    
-    return {
-        "is_legal": is_legal, 
-        "errors": [] if is_legal else ["The uploaded file does not appear to be a legal document."]
-    }
+def _to_prompt_json(obj) -> str:
+    """Serialize state objects for embedding in a prompt.
+
+    OPT_SORT_KEYS makes the bytes deterministic for identical content, so
+    repeated prompts stay prefix-stable for provider caches and for the
+    exact tier of the local llm_cache.
+    """
+    return orjson.dumps(
+        obj,
+        option=orjson.OPT_SORT_KEYS,
+        default=lambda o: o.model_dump() if hasattr(o, "model_dump") else str(o),
+    ).decode()
+
+
+async def _run_agent(agent, input_data):
+    """Invoke an agent without blocking the event loop.
 
+    Local chains are plain callables (sync HTTP under the hood), so they
+    run in a worker thread; Runnables use their native async transport.
+    """
+    if callable(agent):
+        return await asyncio.to_thread(agent, input_data)
+    return await agent.ainvoke(input_data)
 
-def indexer_node(state: AgentState) -> dict:
+
+# Upper bounds on document content fed to any single prompt. The token
+# budget is what the model actually sees; the char bound is a cheap
+# fallback when no tokenizer pass has happened yet.
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "8000"))
+PROMPT_MAX_CHARS = 30000
+
+
+async def _index_document(text: str) -> None:
     """Background indexing for RAG (fire-and-forget)."""
-    if state.get("raw_text"):
-        rag_engine.index_document(state["raw_text"], doc_id=str(uuid.uuid4()))
-    return {}
+    if text:
+        # Embedding is blocking work — keep it off the event loop so it
+        # overlaps with the validation LLM call. Content-addressed id:
+        # the same document always maps to the same collection, so
+        # retries and re-uploads dedupe instead of re-embedding.
+        await asyncio.to_thread(
+            _rag().index_document, text, xxhash.xxh128(text.encode()).hexdigest()
+        )
+
+
+# Vocabulary that marks legal boilerplate. Real contracts hit many of
+# these in the first page; ordinary prose hits essentially none, so the
+# LLM gatekeeper only runs for the ambiguous middle ground.
+_LEGAL_TERMS = frozenset({
+    "party", "parties", "agreement", "herein", "hereby", "whereas",
+    "clause", "shall", "terminate", "termination", "confidential",
+    "confidentiality", "indemnify", "indemnification", "liability",
+    "obligations", "covenant", "breach", "governing", "jurisdiction",
+})
+_HEURISTIC_MIN_HITS = 6
+_PUNCT = ".,;:()\"'"
+
+
+def _legal_term_hits(text: str) -> int:
+    return sum(
+        1 for token in text[:5000].lower().split()
+        if token.strip(_PUNCT) in _LEGAL_TERMS
+    )
 
 
-def discovery_node(state: AgentState) -> dict:
+async def validator_node(state: AgentState, config=None) -> dict:
+    """Validate the document and index it for RAG in one superstep.
+
+    A keyword count over the first page decides the obvious cases for
+    free; only ambiguous documents pay the YES/NO LLM round-trip, and
+    that call is gathered with the Chroma insert so index time hides
+    behind it.
+    """
+    raw_text = _raw_text(state, config)
+    hits = _legal_term_hits(raw_text)
+
+    if hits == 0:
+        # Nothing contract-like at all — reject without an LLM call and
+        # skip indexing a document we are about to refuse.
+        is_legal = False
+    elif hits >= _HEURISTIC_MIN_HITS:
+        is_legal = True
+        await _index_document(raw_text)
+    else:
+        llm = get_model(temperature=0)
+        prompt = f"""You are a legal gatekeeper. Analyze the following text snippet.
+    Is this a legal document (contract, NDA, lease, etc.)?
+    Respond with exactly one word: 'YES' or 'NO'.
+
+    TEXT: {raw_text[:2000]}"""
+
+        response, _ = await asyncio.gather(llm.ainvoke(prompt), _index_document(raw_text))
+        is_legal = "YES" in response.content.upper()
+
+    result = {
+        "is_legal": is_legal,
+        "errors": [] if is_legal else ["The uploaded file does not appear to be a legal document."]
+    }
+    # Truncated once here on token count; the discovery and fused prompts
+    # reuse it instead of slicing their own copies. It goes in the side
+    # table, not state — through state the checkpointer would re-copy it
+    # per superstep and the SSE layer would echo it to the browser.
+    truncated = fit_to_tokens(raw_text, PROMPT_MAX_TOKENS)
+    thread_id = _thread_id(config)
+    if thread_id is not None:
+        _TRUNCATED_STORE[thread_id] = truncated
+    else:
+        result["truncated_text"] = truncated
+    return result
+
+
+async def discovery_node(state: AgentState, config=None) -> dict:
     """Extract key elements and jargon from the document."""
     agent = get_discovery_agent()
-    input_data = {"contract_text": state["raw_text"][:30000]}
-    
+    text = _truncated_text(state, config) or _raw_text(state, config)[:PROMPT_MAX_CHARS]
+    input_data = {"contract_text": text}
+
+    async def compute():
+        return await _run_agent(agent, input_data)
+
     try:
-        result = agent(input_data) if callable(agent) else agent.invoke(input_data)
-        return {"discovery": result.model_dump() if hasattr(result, "model_dump") else result}
+        discovery = await get_or_compute(
+            "discovery", input_data, compute,
+            embed_fn=_rag().embeddings.embed_query,
+            model_cls=LegalDiscovery,
+        )
+        return {"discovery": discovery}
     except Exception as e:
         return {"errors": [f"Discovery error: {str(e)}"]}
 
 
-def analyzer_node(state: AgentState) -> dict:
+async def analyzer_node(state: AgentState) -> dict:
     """Assess risks and provide strategic analysis."""
     agent = get_analyzer_agent()
-    input_data = {"extracted_json": state["discovery"]}
-    
+    # Serialized once here instead of model -> dict -> repr inside the
+    # prompt template.
+    input_data = {"extracted_json": _to_prompt_json(state["discovery"])}
+
+    async def compute():
+        return await _run_agent(agent, input_data)
+
     try:
-        result = agent(input_data) if callable(agent) else agent.invoke(input_data)
-        return {"analysis": result.model_dump() if hasattr(result, "model_dump") else result}
+        analysis = await get_or_compute(
+            "analyzer", input_data, compute,
+            embed_fn=_rag().embeddings.embed_query,
+            model_cls=LegalAnalysis,
+        )
+        return {"analysis": analysis}
     except Exception as e:
         return {"errors": [f"Analysis error: {str(e)}"]}
 
 
-def translator_node(state: AgentState) -> dict:
+async def translator_node(state: AgentState) -> dict:
     """Synthesize discovery and analysis into a human-friendly summary."""
     agent = get_translator_agent()
     input_data = {
-        "analysis_json": {
+        "analysis_json": _to_prompt_json({
             "discovery": state["discovery"],
-            "risks": state["analysis"]
-        }
+            "risks": state["analysis"],
+        })
     }
-    
+
+    async def compute():
+        return await _run_agent(agent, input_data)
+
     try:
-        result = agent(input_data) if callable(agent) else agent.invoke(input_data)
-        return {"final_summary": result.model_dump() if hasattr(result, "model_dump") else result}
+        final_summary = await get_or_compute(
+            "translator", input_data, compute,
+            embed_fn=_rag().embeddings.embed_query,
+            model_cls=ExecutiveSummary,
+        )
+        _prime_chat_context(final_summary)
+        return {"final_summary": final_summary}
     except Exception as e:
         return {"errors": [f"Translation error: {str(e)}"]}
 
 
-def chat_agent(state: AgentState) -> dict:
-    """Conversational Legal Coach with optional contract retrieval tool."""
-    llm = get_model(temperature=0.75, format=None)
-    llm_with_tools = llm.bind_tools([rag_tool])
+async def fused_node(state: AgentState, config=None) -> dict:
+    """Discovery + analysis + summary in a single LLM round-trip.
 
-    summary = state.get("final_summary", {})
-    doc_type = summary.get("doc_type", "the agreement")
-    verdict = summary.get("verdict", "N/A")
+    Used for short contracts, where three serial calls are dominated by
+    the fixed system prompts rather than the document itself.
+    """
+    agent = get_fused_agent()
+    text = _truncated_text(state, config) or _raw_text(state, config)[:PROMPT_MAX_CHARS]
+    input_data = {"contract_text": text}
 
-    system_content = f"""You are a supportive Legal Career Coach.
+    try:
+        result = await _run_agent(agent, input_data)
+        _prime_chat_context(result.final_summary)
+        return {
+            "discovery": result.discovery,
+            "analysis": result.analysis,
+            "final_summary": result.final_summary,
+        }
+    except Exception as e:
+        return {"errors": [f"Fused analysis error: {str(e)}"]}
 
-Background (reference only, do NOT repeat):
-- Document: {doc_type}
-- Recommendation: {verdict}
+
+# Static instructions first, per-document background last: the shared
+# prefix stays byte-identical across threads and turns, so provider
+# prefix caches (DeepSeek caches automatically) only re-process the
+# short dynamic tail.
+_CHAT_SYSTEM_TEMPLATE = """You are a supportive Legal Career Coach.
 
 You have access to a tool that searches the actual contract text.
 Use it when the question is about specific clauses, definitions, obligations, or wording in THIS document.
 Do NOT use it for general legal knowledge or negotiation tactics unless they directly relate to the contract.
 
 Answer naturally, warmly, in plain English. Be encouraging and actionable.
-NEVER output XML, tags, or raw function calls — the system handles tool calls automatically."""
+NEVER output XML, tags, or raw function calls — the system handles tool calls automatically.
+
+Background (reference only, do NOT repeat):
+- Document: {doc_type}
+- Recommendation: {verdict}"""
+
+@lru_cache(maxsize=256)
+def _chat_system_message(doc_type: str, verdict: str) -> SystemMessage:
+    """One SystemMessage per (doc_type, verdict) pair.
+
+    These are constant for the life of a thread, so every chat turn was
+    re-formatting the same multi-line block and allocating a fresh
+    message object for nothing.
+    """
+    return SystemMessage(
+        content=_CHAT_SYSTEM_TEMPLATE.format(doc_type=doc_type, verdict=verdict)
+    )
+
 
-    messages = [SystemMessage(content=system_content)] + state["messages"]
+def _prime_chat_context(summary) -> None:
+    """Format the chat system message while the analysis result is hot.
+
+    doc_type/verdict are fixed once analysis finishes, so doing the
+    format here means the first chat turn hits the lru_cache instead of
+    paying the setup cost inside the interactive path.
+    """
+    _chat_system_message(
+        getattr(summary, "doc_type", None) or "the agreement",
+        getattr(summary, "verdict", None) or "N/A",
+    )
+
+
+# bind_tools walks every tool schema and recompiles a Pydantic model, so
+# the bound LLM is built once and reused across chat turns.
+_chat_llm = None
+
+
+def _get_chat_llm():
+    global _chat_llm
+    if _chat_llm is None:
+        _chat_llm = get_model(temperature=0.75).bind_tools([_rag_tool()])
+    return _chat_llm
+
+
+# Rephrased questions dominate chat traffic; answers are cached per
+# thread on the question embedding so near-duplicates skip the LLM.
+_chat_cache = SemanticCache()
+
+
+def _last_user_query(state: AgentState):
+    for message in reversed(state["messages"]):
+        if message.type == "human" and isinstance(message.content, str):
+            return message.content
+    return None
+
+
+async def chat_agent(state: AgentState, config=None) -> dict:
+    """Conversational Legal Coach with optional contract retrieval tool."""
+    llm_with_tools = _get_chat_llm()
+
+    thread_id = (config or {}).get("configurable", {}).get("thread_id", "default")
+    query = _last_user_query(state)
+    query_vec = None
+    if query:
+        try:
+            # Embedding is a blocking forward pass — keep it off the loop.
+            query_vec = await asyncio.to_thread(_rag().embeddings.embed_query, query)
+            cached = _chat_cache.lookup(thread_id, query_vec)
+            if cached is not None:
+                return {"messages": [AIMessage(content=cached)]}
+        except Exception:
+            query_vec = None  # Cache trouble must never break chat.
+
+    summary = state.get("final_summary")
+    doc_type = getattr(summary, "doc_type", None) or "the agreement"
+    verdict = getattr(summary, "verdict", None) or "N/A"
+
+    messages = [_chat_system_message(doc_type, verdict)] + state["messages"]
+
+    response = await llm_with_tools.ainvoke(messages)
+
+    # Cache only finished answers — a replayed tool call would strand the
+    # ReAct loop.
+    if (
+        query_vec is not None
+        and not getattr(response, "tool_calls", None)
+        and isinstance(response.content, str)
+        and response.content
+    ):
+        _chat_cache.add(thread_id, query_vec, response.content)
 
-    response = llm_with_tools.invoke(messages)
     return {"messages": [response]}
 
 
 # ----------------------------------------------------------------------
 # Routers
 # ----------------------------------------------------------------------
-def route_after_validation(state: AgentState) -> Literal["discovery", "end"]:
-    """Continue analysis only if validated as legal."""
+# The staged pipeline only engages for documents above this size, and
+# only when deep analysis is explicitly enabled. Tunable for benchmarking.
+FUSED_MAX_CHARS = int(os.getenv("FUSED_MAX_CHARS", "8000"))
+
+
+def route_after_validation(state: AgentState, config=None) -> Literal["discovery", "fused", "end"]:
+    """Continue analysis only if validated as legal.
+
+    One fused LLM call is the default for every document — three serial
+    round-trips dominate wall time and cost. The staged
+    discovery -> analyzer -> translator path survives behind
+    LEGAL_DEEP_ANALYSIS=true for long contracts where per-stage reasoning
+    earns its extra round-trips.
+    """
     if state.get("is_legal") and not state.get("errors"):
-        return "discovery"
+        if (
+            os.getenv("LEGAL_DEEP_ANALYSIS") == "true"
+            # The prompt-bound prefix the validator just produced; like
+            # raw_text it lives in the side table, not state.
+            and len(_truncated_text(state, config)) > FUSED_MAX_CHARS
+        ):
+            return "discovery"
+        return "fused"
     return "end"
 
 
@@ -168,12 +465,12 @@ def create_legal_engine():
 
     # Nodes
     workflow.add_node("validator", validator_node)
-    workflow.add_node("indexer", indexer_node)
     workflow.add_node("discovery", discovery_node)
+    workflow.add_node("fused", fused_node)
     workflow.add_node("analyzer", analyzer_node)
     workflow.add_node("translator", translator_node)
     workflow.add_node("chat_agent", chat_agent)
-    workflow.add_node("tools", ToolNode(tools=[rag_tool]))
+    workflow.add_node("tools", ToolNode(tools=[_rag_tool()]))
 
     # Entry router
     workflow.add_node("router", lambda state: {"mode": state.get("mode")})
@@ -190,13 +487,12 @@ def create_legal_engine():
     workflow.add_conditional_edges(
         "validator",
         route_after_validation,
-        {"discovery": "discovery", "end": END},
+        {"discovery": "discovery", "fused": "fused", "end": END},
     )
-    workflow.add_edge("validator", "indexer")  # Index in parallel regardless
     workflow.add_edge("discovery", "analyzer")
     workflow.add_edge("analyzer", "translator")
     workflow.add_edge("translator", END)
-    workflow.add_edge("indexer", END)  # Indexer ends independently
+    workflow.add_edge("fused", END)
 
     # Chat path → ReAct loop
     workflow.add_conditional_edges(
@@ -206,4 +502,4 @@ def create_legal_engine():
     )
     workflow.add_edge("tools", "chat_agent")
 
-    return workflow.compile(checkpointer=InMemorySaver())
\ No newline at end of file
+    return workflow.compile(checkpointer=BoundedInMemorySaver())
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""
+Prompt-output cache for the staged analysis nodes.
+
+Structurally similar contracts (standard NDAs, boilerplate employment
+offers) trigger the same three serial LLM calls over and over. This
+module memoizes node outputs behind two tiers:
+
+1. Exact tier — blake2b hash of the canonicalized input, in-process LRU.
+   Free and always on.
+2. Semantic tier — the canonicalized input is embedded with the same
+   embedder the RAG pipeline uses and looked up in a per-node Chroma
+   collection; a cosine similarity at or above the threshold returns the
+   stored output without calling the LLM.
+
+Both tiers are best-effort: any cache failure falls through to the real
+computation.
+"""
+
+import asyncio
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+import orjson
+
+from src.agents.response_cache import is_fallback
+
+# Exact-match tier. Keys are cheap (32-byte digests) so a generous bound
+# costs little memory; values are node outputs (dicts or Pydantic models).
+_EXACT_MAXSIZE = 512
+_exact_cache: OrderedDict = OrderedDict()
+_exact_lock = Lock()
+
+# Semantic tier: one in-memory Chroma collection per node, created lazily
+# so processes that never analyze documents pay nothing.
+_chroma_client = None
+_collections: dict = {}
+
+# Long inputs are truncated before embedding — the embedder's context
+# window is far smaller than a contract, and the head of the document
+# carries the structural signal we key on.
+_EMBED_MAX_CHARS = 4000
+
+
+def _canonical(input_obj) -> bytes:
+    return orjson.dumps(input_obj, option=orjson.OPT_SORT_KEYS, default=str)
+
+
+def _get_collection(node_name: str):
+    global _chroma_client
+    if _chroma_client is None:
+        import chromadb
+        _chroma_client = chromadb.EphemeralClient()
+    if node_name not in _collections:
+        _collections[node_name] = _chroma_client.get_or_create_collection(
+            name=f"llm_cache_{node_name}",
+            metadata={"hnsw:space": "cosine"},
+        )
+    return _collections[node_name]
+
+
+def _exact_get(key: bytes):
+    with _exact_lock:
+        if key in _exact_cache:
+            _exact_cache.move_to_end(key)
+            return _exact_cache[key]
+    return None
+
+
+def _exact_put(key: bytes, value: dict) -> None:
+    with _exact_lock:
+        _exact_cache[key] = value
+        _exact_cache.move_to_end(key)
+        while len(_exact_cache) > _EXACT_MAXSIZE:
+            _exact_cache.popitem(last=False)
+
+
+def _semantic_lookup(node_name: str, embedding, threshold: float):
+    collection = _get_collection(node_name)
+    if collection.count() == 0:
+        return None
+    hits = collection.query(query_embeddings=[embedding], n_results=1)
+    distances = hits.get("distances") or [[]]
+    documents = hits.get("documents") or [[]]
+    if distances[0] and documents[0]:
+        # Chroma reports cosine distance (1 - similarity).
+        if 1.0 - distances[0][0] >= threshold:
+            return orjson.loads(documents[0][0])
+    return None
+
+
+def _semantic_store(node_name: str, key_hex: str, embedding, output: dict) -> None:
+    collection = _get_collection(node_name)
+    collection.upsert(
+        ids=[key_hex],
+        embeddings=[embedding],
+        documents=[orjson.dumps(output).decode()],
+    )
+
+
+async def get_or_compute(node_name, input_obj, compute_fn, embed_fn=None,
+                         threshold=0.92, model_cls=None):
+    """
+    Return the cached output for (node_name, input_obj), or await
+    compute_fn() and cache its result.
+
+    compute_fn must be an async zero-arg callable. embed_fn (optional) is
+    a sync text -> vector callable; when given it enables the semantic
+    tier for near-duplicate inputs. model_cls (optional) names the
+    Pydantic model compute_fn returns: the exact tier then holds the
+    object itself, and semantic hits are rehydrated through
+    model_cls.model_validate.
+    """
+    payload = _canonical(input_obj)
+    digest = hashlib.blake2b(node_name.encode() + b"\x00" + payload).digest()
+
+    cached = _exact_get(digest)
+    if cached is not None:
+        return cached
+
+    embedding = None
+    if embed_fn is not None:
+        try:
+            text = payload.decode()[:_EMBED_MAX_CHARS]
+            embedding = await asyncio.to_thread(embed_fn, text)
+            hit = await asyncio.to_thread(_semantic_lookup, node_name, embedding, threshold)
+            if hit is not None:
+                if model_cls is not None:
+                    hit = model_cls.model_validate(hit)
+                _exact_put(digest, hit)
+                return hit
+        except Exception:
+            embedding = None  # Cache trouble must never block analysis.
+
+    output = await compute_fn()
+
+    if is_fallback(output):
+        # Degraded result from an agent's error path — hand it back but
+        # keep it out of both tiers so a retry gets a fresh attempt.
+        return output
+
+    _exact_put(digest, output)
+    if embedding is not None:
+        try:
+            stored = output.model_dump() if model_cls is not None else output
+            await asyncio.to_thread(
+                _semantic_store, node_name, digest.hex(), embedding, stored
+            )
+        except Exception:
+            pass
+    return output
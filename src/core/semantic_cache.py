@@ -0,0 +1,73 @@
+"""
+Semantic response cache for the chat path.
+
+Users rephrase the same question constantly ("what's the termination
+clause?" / "how do I get out of this contract?"). Each rephrase pays a
+full LLM round-trip even though the answer is identical. This cache
+keys finished answers on the embedding of the user's question, scoped
+per conversation thread so one user's contract never answers another's
+question; a cosine match at or above the threshold returns the stored
+answer in milliseconds instead of seconds.
+
+Only final answers belong here — tool-call turns are intermediate steps
+and must never be replayed from cache.
+"""
+
+import time
+from threading import Lock
+
+import numpy as np
+
+
+class SemanticCache:
+    """Per-thread embedding-keyed cache of chat answers."""
+
+    def __init__(self, threshold: float = 0.92, ttl_seconds: int = 3600,
+                 max_entries_per_thread: int = 256):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_thread = max_entries_per_thread
+        # thread_id -> list of {"vec", "response", "ts"}; oldest first.
+        self._threads: dict = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _prune(self, entries: list) -> list:
+        cutoff = time.monotonic() - self.ttl_seconds
+        return [e for e in entries if e["ts"] >= cutoff]
+
+    def lookup(self, thread_id: str, embedding):
+        """Return the cached answer for a similar-enough query, or None."""
+        query = self._normalize(embedding)
+        with self._lock:
+            entries = self._prune(self._threads.get(thread_id, []))
+            self._threads[thread_id] = entries
+            if not entries:
+                return None
+            # One stacked matmul instead of a Python loop of dots: BLAS
+            # computes all cosines in a single SIMD pass, which keeps the
+            # scan flat even if the per-thread cap is raised.
+            matrix = np.stack([e["vec"] for e in entries])
+            sims = matrix @ query
+            best = int(np.argmax(sims))
+            if float(sims[best]) >= self.threshold:
+                return entries[best]["response"]
+        return None
+
+    def add(self, thread_id: str, embedding, response: str) -> None:
+        entry = {
+            "vec": self._normalize(embedding),
+            "response": response,
+            "ts": time.monotonic(),
+        }
+        with self._lock:
+            entries = self._prune(self._threads.get(thread_id, []))
+            entries.append(entry)
+            if len(entries) > self.max_entries_per_thread:
+                entries = entries[-self.max_entries_per_thread:]
+            self._threads[thread_id] = entries
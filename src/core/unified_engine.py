@@ -1,20 +1,28 @@
-import uuid
+from __future__ import annotations
+
+import asyncio
+from functools import cache, lru_cache
+
+import xxhash
 from typing import (
-    Annotated, List, Literal, 
+    Annotated, List, Literal, Union,
     TypedDict, Optional
 )
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import InMemorySaver
 from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_core.messages import (
-    BaseMessage, SystemMessage,
-    HumanMessage, AIMessage
+    BaseMessage, SystemMessage, AIMessage
 )
 from langgraph.graph.message import add_messages
 
 from src.agents.unified_extractor import get_unified_agent
+from src.agents.schemas import UnifiedLegalResponse
 from src.agents.get_model import get_model
-from src.core.rag_pipeline import LegalRAG
+from src.core.rag_pipeline import LegalRAG, rag_engine
+from src.core.checkpoint import BoundedInMemorySaver
+from src.core.semantic_cache import SemanticCache
+from src.utils.cache import TTLCache
+from src.utils.truncate import fit_to_tokens
 
 
 # ----------------------------------------------------------------------
@@ -22,9 +30,13 @@ from src.core.rag_pipeline import LegalRAG
 # ----------------------------------------------------------------------
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], add_messages]
+    # Fallback only — full document text normally lives in the
+    # thread-keyed side table below so the checkpointer never copies it.
     raw_text: str
     is_legal: bool
-    final_summary: Optional[dict]
+    # The model object itself; serialized once by the SSE layer on the
+    # way out instead of a model_dump here and a re-walk there.
+    final_summary: Optional[UnifiedLegalResponse]
     mode: Literal["analyze", "chat"]          # ← controls entry path
     errors: List[str]
 
@@ -32,30 +44,73 @@ class AgentState(TypedDict):
 # ----------------------------------------------------------------------
 # Global Resources (singleton style)
 # ----------------------------------------------------------------------
-rag_engine = LegalRAG()
-rag_tool = rag_engine.as_tool()               # tool is created once
+def _rag() -> LegalRAG:
+    # Process-wide shared pipeline — one embedding model and one vector
+    # store no matter how many modules import an engine.
+    return rag_engine
+
+
+@cache
+def _rag_tool():
+    return _rag().as_tool()                   # tool is created once
+
+
+# Heavy document text stays out of graph state: LangGraph copies the
+# state dict on every reducer update and the checkpointer re-serializes
+# it at each node boundary, so a 30k-char raw_text was duplicated per
+# step. The side table mirrors the SSE layer's doc_store (bounded,
+# expiring, internally locked); nodes resolve text by thread_id and fall
+# back to the state field for direct invocations.
+_RAW_TEXT_STORE = TTLCache(maxsize=512, ttl_seconds=3600)
+
+
+def put_raw_text(thread_id: str, text: str) -> None:
+    """Register a document's anonymized text for a thread before invoking."""
+    _RAW_TEXT_STORE[thread_id] = text
+
+
+def _raw_text(state: AgentState, config) -> str:
+    thread_id = (config or {}).get("configurable", {}).get("thread_id")
+    if thread_id is not None:
+        text = _RAW_TEXT_STORE.get(thread_id)
+        if text is not None:
+            return text
+    return state.get("raw_text") or ""
 
 
 # ----------------------------------------------------------------------
 # Nodes
 # ----------------------------------------------------------------------
-def indexer_node(state: AgentState) -> dict:
+async def indexer_node(state: AgentState, config=None) -> dict:
     """Background indexing of the document (fire-and-forget)."""
-    if state.get("raw_text"):
-        rag_engine.index_document(state["raw_text"], doc_id=str(uuid.uuid4()))
+    raw_text = _raw_text(state, config)
+    if raw_text:
+        # Embedding + insert is blocking CPU/IO work; a worker thread lets
+        # it overlap with the brain LLM call in the same superstep.
+        # Content-addressed id: the same document always maps to the same
+        # collection, so retries and re-uploads dedupe instead of
+        # re-embedding.
+        await asyncio.to_thread(
+            _rag().index_document, raw_text, xxhash.xxh128(raw_text.encode()).hexdigest()
+        )
     return {}
 
 
-def brain_node(state: AgentState) -> dict:
+# Token budget for the single-pass brain prompt (the old 15k-char slice
+# was ~4k tokens of dense legalese).
+_BRAIN_MAX_TOKENS = 4000
+
+
+async def brain_node(state: AgentState, config=None) -> dict:
     """Single-pass legal analysis (validation + summary + risk assessment)."""
     agent = get_unified_agent()
-    input_text = state["raw_text"][:15000]
+    input_text = fit_to_tokens(_raw_text(state, config), _BRAIN_MAX_TOKENS)
 
     try:
         result = (
-            agent(input_text)
+            await asyncio.to_thread(agent, input_text)
             if callable(agent)
-            else agent.invoke({"contract_text": input_text})
+            else await agent.ainvoke({"contract_text": input_text})
         )
 
         if not getattr(result, "is_legal", False):
@@ -64,25 +119,18 @@ def brain_node(state: AgentState) -> dict:
                 "errors": ["Not a recognized legal document."],
             }
 
+        _prime_chat_context(result)
         return {
             "is_legal": True,
-            "final_summary": result.model_dump(),
+            "final_summary": result,
             "errors": [],
         }
 
     except Exception as e:
         return {"errors": [f"Brain error: {str(e)}"]}
 
-def chat_agent(state: AgentState) -> dict:
-    """Conversational Legal Coach with optional contract retrieval tool."""
-    llm = get_model(temperature=0.75, format=None)
-    llm_with_tools = llm.bind_tools([rag_tool])
-
-    summary = state.get("final_summary", {})
-    doc_type = summary.get("doc_type", "the agreement")
-    verdict = summary.get("verdict", "N/A")
-
-    system_content = f"""You are a supportive Legal Career Coach.
+# Per-turn template hoisted to module scope; only doc_type/verdict vary.
+_CHAT_SYSTEM_TEMPLATE = """You are a supportive Legal Career Coach.
         Background (reference only, do NOT repeat):
         - Document: {doc_type}
         - Recommendation: {verdict}
@@ -98,11 +146,78 @@ def chat_agent(state: AgentState) -> dict:
         NEVER output raw XML, <function_calls>, <invoke>, or any tags — the system handles tool calls automatically.
         Respond in plain, natural English only. If calling a tool, do so internally without formatting."""
 
-    messages = [SystemMessage(content=system_content)] + state["messages"]
+@lru_cache(maxsize=256)
+def _chat_system_message(doc_type: str, verdict: str) -> SystemMessage:
+    """One SystemMessage per (doc_type, verdict) pair — constant for the
+    life of a thread, so per-turn re-formatting was pure churn."""
+    return SystemMessage(
+        content=_CHAT_SYSTEM_TEMPLATE.format(doc_type=doc_type, verdict=verdict)
+    )
+
+
+def _prime_chat_context(summary) -> None:
+    """Format the chat system message while the analysis result is hot.
+
+    doc_type/verdict are fixed once analysis finishes, so doing the
+    format here means the first chat turn hits the lru_cache instead of
+    paying the setup cost inside the interactive path.
+    """
+    _chat_system_message(
+        getattr(summary, "doc_type", None) or "the agreement",
+        getattr(summary, "verdict", None) or "N/A",
+    )
+
+
+# bind_tools recompiles the tool schemas each time it runs, so the bound
+# chat LLM is built lazily once and shared across turns.
+_chat_llm = None
+
+
+def _get_chat_llm():
+    global _chat_llm
+    if _chat_llm is None:
+        _chat_llm = get_model(temperature=0.75).bind_tools([_rag_tool()])
+    return _chat_llm
+
+
+# Per-thread cache of finished answers keyed on the question embedding;
+# rephrased questions skip the LLM entirely.
+_chat_cache = SemanticCache()
+
+
+def _last_user_query(state: AgentState):
+    for message in reversed(state["messages"]):
+        if message.type == "human" and isinstance(message.content, str):
+            return message.content
+    return None
+
+
+async def chat_agent(state: AgentState, config=None) -> dict:
+    """Conversational Legal Coach with optional contract retrieval tool."""
+    llm_with_tools = _get_chat_llm()
+
+    thread_id = (config or {}).get("configurable", {}).get("thread_id", "default")
+    query = _last_user_query(state)
+    query_vec = None
+    if query:
+        try:
+            # Embedding is a blocking forward pass — keep it off the loop.
+            query_vec = await asyncio.to_thread(_rag().embeddings.embed_query, query)
+            cached = _chat_cache.lookup(thread_id, query_vec)
+            if cached is not None:
+                return {"messages": [AIMessage(content=cached)]}
+        except Exception:
+            query_vec = None  # Cache trouble must never break chat.
+
+    summary = state.get("final_summary")
+    doc_type = getattr(summary, "doc_type", None) or "the agreement"
+    verdict = getattr(summary, "verdict", None) or "N/A"
+
+    messages = [_chat_system_message(doc_type, verdict)] + state["messages"]
 
     # Retry loop for malformed outputs (max 2 tries)
     for _ in range(2):
-        response = llm_with_tools.invoke(messages)
+        response = await llm_with_tools.ainvoke(messages)
         
         # Check for hallucinated XML
         if isinstance(response.content, str) and ("<function_calls>" in response.content or "<invoke>" in response.content):
@@ -110,8 +225,15 @@ def chat_agent(state: AgentState) -> dict:
             messages.append(response)
             messages.append(SystemMessage("Your last response had invalid XML. Respond in plain text only, no tags. Use tools internally if needed."))
             continue
-        
-        # Valid — return
+
+        # Valid — cache finished answers (never tool-call turns) and return
+        if (
+            query_vec is not None
+            and not getattr(response, "tool_calls", None)
+            and isinstance(response.content, str)
+            and response.content
+        ):
+            _chat_cache.add(thread_id, query_vec, response.content)
         return {"messages": [response]}
     
     # Fallback after retries
@@ -122,12 +244,17 @@ def chat_agent(state: AgentState) -> dict:
 # ----------------------------------------------------------------------
 # Router
 # ----------------------------------------------------------------------
-def route_entry(state: AgentState) -> Literal["brain", "chat_agent"]:
-    """Decide which path to take based on mode + guard conditions."""
+def route_entry(state: AgentState) -> Union[str, List[str]]:
+    """Decide which path to take based on mode + guard conditions.
+
+    Analysis fans out to brain + indexer in the same superstep: indexing
+    is independent of the LLM call, so its latency hides entirely behind
+    the brain round-trip instead of being paid serially afterwards.
+    """
     mode = state.get("mode")
 
     if mode == "analyze":
-        return "brain"
+        return ["brain", "indexer"]
 
     if mode == "chat":
         # Guard: chat is only allowed after successful analysis
@@ -135,10 +262,10 @@ def route_entry(state: AgentState) -> Literal["brain", "chat_agent"]:
             return "chat_agent"
         # Fallback: if chat is requested but analysis failed → run analysis first
         # (prevents broken chats on bad documents)
-        return "brain"
+        return ["brain", "indexer"]
 
     # Default fallback (should never reach here with proper input)
-    return "brain"
+    return ["brain", "indexer"]
 
 
 # ----------------------------------------------------------------------
@@ -151,21 +278,21 @@ def create_legal_engine():
     workflow.add_node("brain", brain_node)
     workflow.add_node("indexer", indexer_node)
     workflow.add_node("chat_agent", chat_agent)
-    workflow.add_node("tools", ToolNode(tools=[rag_tool]))
+    workflow.add_node("tools", ToolNode(tools=[_rag_tool()]))
 
     # Entry router
     workflow.add_node("router", lambda state: {"mode": state.get("mode")})
     workflow.set_entry_point("router")
 
-    # Router decides next node
+    # Router decides next node(s) — analyze mode fans out to brain+indexer
     workflow.add_conditional_edges(
         "router",
         route_entry,
-        {"brain": "brain", "chat_agent": "chat_agent"},
+        {"brain": "brain", "indexer": "indexer", "chat_agent": "chat_agent"},
     )
 
-    # Analysis path (one-time)
-    workflow.add_edge("brain", "indexer")
+    # Analysis path (one-time, brain and indexer run concurrently)
+    workflow.add_edge("brain", END)
     workflow.add_edge("indexer", END)
 
     # Chat path → ReAct loop
@@ -176,4 +303,4 @@ def create_legal_engine():
     )
     workflow.add_edge("tools", "chat_agent")
 
-    return workflow.compile(checkpointer=InMemorySaver())
+    return workflow.compile(checkpointer=BoundedInMemorySaver())
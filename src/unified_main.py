@@ -1,21 +1,29 @@
 import os
 import asyncio
-import json
-import uuid
 import logging
+
+import orjson
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.responses import StreamingResponse, HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
-from typing import Dict
-import threading
+
+try:
+    # uuid7 is time-ordered (ULID-style): session ids sort
+    # chronologically in logs and on disk, and generation avoids a
+    # urandom syscall per request.
+    from uuid_utils import uuid7 as _new_session_id
+except ImportError:
+    from uuid import uuid4 as _new_session_id
 
 from langchain_core.messages import HumanMessage
 
-from src.core.unified_engine import create_legal_engine
-from src.utils.parser import parse_legal_document
+from src.core.unified_engine import create_legal_engine, put_raw_text
+from src.utils.parser import iter_legal_document_pages
 from src.utils.scrub import anonymize_contract
-from src.core.rag_pipeline import LegalRAG
+from src.core.rag_pipeline import rag_engine
+from src.utils.cache import TTLCache
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -23,12 +31,13 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="LegalCouncil AI")
 engine = create_legal_engine()
-rag_engine = LegalRAG()
 
-# Thread-safe document store so we can keep track
-# of uploaded documents and their processed versions across requests
-doc_store: Dict[str, str] = {}
-doc_store_lock = threading.Lock()
+# Document store keyed by session. Bounded + expiring: the old
+# unbounded dict kept every contract's full text in RAM until shutdown.
+# TTLCache locks internally and the values are immutable strings, so no
+# caller-side mutex is needed — the old global lock serialized every
+# chat request behind every upload.
+doc_store = TTLCache(maxsize=512, ttl_seconds=3600)
 
 app.add_middleware(
     CORSMiddleware,
@@ -36,58 +45,141 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Compresses the landing page and other buffered responses. This
+# starlette version excludes text/event-stream from gzip entirely, so
+# SSE frames pass through uncompressed — and, importantly, unbuffered.
+app.add_middleware(GZipMiddleware, minimum_size=512)
+
+# Proxies (nginx, Cloud Run) buffer streamed responses unless told not
+# to, which would defeat the per-event flushing below.
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def make_config(thread_id: str) -> dict:
+    """Build the LangGraph run config for a session in one place."""
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def _json_default(obj):
+    """orjson fallback for types it can't encode natively.
+
+    Pydantic models dump through their Rust core; anything else (e.g. a
+    stray message object) degrades to its string form. orjson walks the
+    containers in C, replacing the old recursive Python-level
+    serialize_data pass.
+    """
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    return str(obj)
+
+
+def sse(obj) -> bytes:
+    """Encode one SSE frame.
+
+    orjson serializes at C speed and returns bytes, which
+    StreamingResponse sends as-is — under token streaming json.dumps ran
+    hundreds of times per response as pure Python encoding overhead.
+    """
+    return b"data: " + orjson.dumps(
+        obj, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY
+    ) + b"\n\n"
+
+
+# Frames whose payload never varies are encoded once at import time
+# instead of once per request.
+_FRAME_UPLOADED = sse({'progress': 5, 'message': 'File uploaded'})
+_FRAME_EXTRACTING = sse({'progress': 15, 'message': 'Extracting and cleaning text'})
+_FRAME_PREPARED = sse({'progress': 30, 'message': 'Document prepared for analysis'})
+_FRAME_SCANNING = sse({'progress': 40, 'message': 'Running legal validation & risk scan'})
+_FRAME_COMPLETE = sse({'progress': 100, 'message': 'Analysis complete'})
+_FRAME_DONE = sse({'done': True})
+
+# Dynamic-but-trivial frames: the payload varies only by a node name or
+# a page count, both known JSON-safe, so a bytes template with
+# %-substitution skips the dict build and JSON encode entirely.
+_FRAME_SCRUBBED_TMPL = b'data: {"progress":%d,"message":"Scrubbed page %d"}\n\n'
+
+
+@app.on_event("startup")
+async def warmup():
+    """Pay one-time lazy costs before the first real request.
+
+    The first embed triggers the model load plus kernel/primitive
+    autotuning (seconds of added latency for whoever uploads first), and
+    the first analysis builds the agent chain. Best-effort: a failed
+    warmup just means the first request pays the cold start as before.
+    """
+    os.makedirs("data/raw", exist_ok=True)
+
+    def _warm():
+        try:
+            from src.agents.unified_extractor import get_unified_agent
+            get_unified_agent()
+            rag_engine.embeddings.embed_query("warmup")
+        except Exception as e:
+            logger.warning(f"Warmup failed: {e}")
+
+    await asyncio.to_thread(_warm)
+
 
-def serialize_data(data):
-    """Recursively convert Pydantic models/dicts to JSON-serializable types."""
-    if isinstance(data, BaseModel):
-        return data.model_dump()
-    if isinstance(data, dict):
-        return {k: serialize_data(v) for k, v in data.items()}
-    if isinstance(data, list):
-        return [serialize_data(i) for i in data]
-    return data
+# The landing page is static — read it once at import instead of a
+# blocking open/read on the event loop per hit.
+with open(os.path.join("templates", "unified_index.html"), "rb") as _f:
+    _INDEX_HTML = _f.read()
 
 
 @app.get("/", response_class=HTMLResponse)
 async def get_ui():
-    template_path = os.path.join("templates", "unified_index.html")
-    with open(template_path, "r") as f:
-        return f.read()
+    return HTMLResponse(content=_INDEX_HTML)
 
 
 @app.post("/analyze")
 async def analyze_document(file: UploadFile = File(...)):
-    thread_id = str(uuid.uuid4())
-    content = await file.read()
-
-    os.makedirs("data/raw", exist_ok=True)
+    thread_id = str(_new_session_id())
     temp_path = f"data/raw/{thread_id}.pdf"
 
+    # Stream the upload to disk in 1MB chunks: peak memory no longer
+    # includes the whole PDF, and the blocking writes happen in a worker
+    # thread instead of on the event loop. (aiofiles isn't a dependency
+    # here; to_thread over a plain file gives the same loop hygiene.)
     with open(temp_path, "wb") as f:
-        f.write(content)
+        while chunk := await file.read(1 << 20):
+            await asyncio.to_thread(f.write, chunk)
 
     async def event_generator():
         try:
             # Send initial progress
-            yield f"data: {json.dumps({'progress': 5, 'message': 'File uploaded'})}\n\n"
+            yield _FRAME_UPLOADED
             
             # Extract and clean text
-            yield f"data: {json.dumps({'progress': 15, 'message': 'Extracting and cleaning text'})}\n\n"
+            yield _FRAME_EXTRACTING
             
-            raw_md = parse_legal_document(temp_path)
-            safe_md = anonymize_contract(raw_md)
+            # Pages are scrubbed as they come off the parser, so Presidio
+            # work and progress events overlap parsing instead of waiting
+            # for the whole document; each blocking step runs in a worker
+            # thread so other SSE streams keep flowing.
+            safe_pages = []
+            page_iter = iter_legal_document_pages(temp_path)
+            while True:
+                page = await asyncio.to_thread(next, page_iter, None)
+                if page is None:
+                    break
+                safe_pages.append(await asyncio.to_thread(anonymize_contract, page))
+                yield _FRAME_SCRUBBED_TMPL % (min(15 + len(safe_pages), 29), len(safe_pages))
+            safe_md = "\n\n".join(safe_pages)
             
-            # Thread-safe store update
-            with doc_store_lock:
-                doc_store[thread_id] = safe_md
+            doc_store[thread_id] = safe_md
+            # Full text goes into the engine's side table; state carries
+            # only ids and node outputs, keeping per-step checkpoints tiny.
+            put_raw_text(thread_id, safe_md)
 
-            yield f"data: {json.dumps({'progress': 30, 'message': 'Document prepared for analysis'})}\n\n"
+            yield _FRAME_PREPARED
 
-            config = {"configurable": {"thread_id": thread_id}}
+            config = make_config(thread_id)
 
             initial_state = {
                 "messages": [],
-                "raw_text": safe_md,
+                "raw_text": "",
                 "is_legal": True,
                 "final_summary": None,
                 "mode": "analyze",
@@ -95,33 +187,31 @@ async def analyze_document(file: UploadFile = File(...)):
             }
 
             # Run legal validation & risk scan
-            yield f"data: {json.dumps({'progress': 40, 'message': 'Running legal validation & risk scan'})}\n\n"
+            yield _FRAME_SCANNING
 
             analysis_complete = False
             brain_data = None
             
             # Stream updates from engine
             async for chunk in engine.astream(initial_state, config=config, stream_mode="updates"): # type: ignore
-                node_name = list(chunk.keys())[0]
+                node_name = next(iter(chunk))
                 data = chunk[node_name]
 
                 if node_name == "brain":
                     if data.get("is_legal") is False:
-                        yield f"data: {json.dumps({'progress': 100, 'message': 'Analysis complete'})}\n\n"
-                        yield f"data: {json.dumps({'error': 'Not a legal document', 'thread_id': thread_id})}\n\n"
+                        yield _FRAME_COMPLETE
+                        yield sse({'error': 'Not a legal document', 'thread_id': thread_id})
                         return
 
                     # Store brain data and mark completion
-                    brain_data = serialize_data(data)
+                    brain_data = data
                     analysis_complete = True
 
                     # Send the brain data immediately
-                    yield f"data: {json.dumps({'node': 'brain', 'update': brain_data, 'progress': 95})}\n\n"
+                    yield sse({'node': 'brain', 'update': brain_data, 'progress': 95})
 
             # Send final completion signals immediately after brain node
             if analysis_complete:
-                # Small delay to ensure UI processes the brain data
-                await asyncio.sleep(0.1)
                 
                 # Send final progress and done status together
                 final_payload = {
@@ -130,17 +220,17 @@ async def analyze_document(file: UploadFile = File(...)):
                     'status': 'done', 
                     'thread_id': thread_id
                 }
-                yield f"data: {json.dumps(final_payload)}\n\n"
+                yield sse(final_payload)
                 
                 # Log completion
                 logger.info(f"Analysis complete for thread {thread_id}")
             else:
                 # Handle case where brain node wasn't found
-                yield f"data: {json.dumps({'error': 'Analysis incomplete - no results generated', 'thread_id': thread_id})}\n\n"
+                yield sse({'error': 'Analysis incomplete - no results generated', 'thread_id': thread_id})
 
         except Exception as e:
             logger.error(f"Analysis error: {str(e)}")
-            yield f"data: {json.dumps({'progress': 100, 'message': 'Error occurred', 'error': f'Analysis failed: {str(e)}', 'thread_id': thread_id})}\n\n"
+            yield sse({'progress': 100, 'message': 'Error occurred', 'error': f'Analysis failed: {str(e)}', 'thread_id': thread_id})
         
         finally:
             # Clean up temp file
@@ -150,18 +240,16 @@ async def analyze_document(file: UploadFile = File(...)):
             except Exception as e:
                 logger.warning(f"Failed to remove temp file {temp_path}: {e}")
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=_SSE_HEADERS)
 
 
 @app.post("/chat/{thread_id}")
 async def chat_stream(thread_id: str, query: str):
     # Check if thread exists
-    with doc_store_lock:
-        if thread_id not in doc_store:
-            raise HTTPException(404, "Session not found")
-        doc_text = doc_store[thread_id]  # Get doc for logging/context
+    if thread_id not in doc_store:
+        raise HTTPException(404, "Session not found")
 
-    config = {"configurable": {"thread_id": thread_id}}
+    config = make_config(thread_id)
 
     input_data = {
         "messages": [HumanMessage(content=query)],
@@ -170,53 +258,93 @@ async def chat_stream(thread_id: str, query: str):
 
     async def event_generator():
         try:
-            # Send a small initial delay to ensure connection is established
-            await asyncio.sleep(0.05)
-            
             # Track if we've sent any tokens
             tokens_sent = False
-            
+
+            # One SSE frame per token costs a serialize plus a socket
+            # write each; coalescing up to 8 tokens (or 20ms, whichever
+            # comes first) cuts that ~8x and is imperceptible to read.
+            loop = asyncio.get_running_loop()
+            buf = []
+            last_flush = loop.time()
+
             async for event in engine.astream_events(input_data, config, version="v2"):
                 kind = event["event"]
 
                 if kind == "on_chat_model_stream":
+                    # Only forward the coach's tokens; the brain fallback
+                    # path also emits stream events under this graph.
+                    if event.get("metadata", {}).get("langgraph_node") != "chat_agent":
+                        continue
                     content = event["data"]["chunk"].content
                     if content:
                         tokens_sent = True
-                        yield f"data: {json.dumps({'token': content})}\n\n"
+                        buf.append(content)
+                        now = loop.time()
+                        if len(buf) >= 8 or now - last_flush > 0.02:
+                            yield sse({'token': ''.join(buf)})
+                            buf.clear()
+                            last_flush = now
 
                 elif kind == "on_tool_start":
+                    if buf:
+                        yield sse({'token': ''.join(buf)})
+                        buf.clear()
                     # Optional: send tool start message
                     tool_name = event.get("name", "unknown")
-                    yield f"data: {json.dumps({'tool_start': tool_name})}\n\n"
+                    yield sse({'tool_start': tool_name})
 
                 elif kind == "on_tool_end":
                     # Optional: yield tool output summary
                     output = event["data"].get("output", {})
                     if output:
-                        yield f"data: {json.dumps({'tool_end': 'retrieved context'})}\n\n"
-
+                        yield sse({'tool_end': 'retrieved context'})
+
+                elif kind == "on_chain_end" and event.get("name") == "chat_agent":
+                    # A semantic-cache hit answers without a model call, so
+                    # no stream events fire; surface the node's final
+                    # message here or the user sees an empty reply.
+                    if not tokens_sent:
+                        messages = (event["data"].get("output") or {}).get("messages") or []
+                        content = getattr(messages[-1], "content", None) if messages else None
+                        if isinstance(content, str) and content:
+                            yield sse({'token': content})
+                            tokens_sent = True
+
+            if buf:
+                yield sse({'token': ''.join(buf)})
             # Send done signal
-            yield f"data: {json.dumps({'done': True})}\n\n"
+            yield _FRAME_DONE
             
             # Log successful completion
             logger.info(f"Chat completed for thread {thread_id}, tokens sent: {tokens_sent}")
 
         except Exception as e:
             logger.error(f"Chat error: {str(e)}")
-            yield f"data: {json.dumps({'error': f'Chat failed: {str(e)}'})}\n\n"
+            yield sse({'error': f'Chat failed: {str(e)}'})
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=_SSE_HEADERS)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up resources on shutdown"""
-    with doc_store_lock:
-        doc_store.clear()
+    doc_store.clear()
     logger.info("Application shutdown, cleared document store")
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # One process runs one event loop; scale across cores with
+    # WEB_CONCURRENCY workers (import string required for workers > 1).
+    # uvloop + httptools replace the default asyncio loop and h11
+    # parser with C implementations — the biggest free throughput knob
+    # for an SSE-heavy async app.
+    uvicorn.run(
+        "src.unified_main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+    )
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+Small in-process TTL cache for the API layer.
+
+The upload endpoints keep per-session document text keyed by thread_id;
+a plain dict grows for the life of the process and will eventually OOM a
+long-running server. This cache bounds both entry count (LRU) and entry
+age (TTL) while exposing just the mapping surface the endpoints use, so
+it drops in where the dict was. All operations take an internal lock,
+making reads safe without caller-side locking.
+"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Dict-like LRU cache whose entries expire after a fixed TTL."""
+
+    def __init__(self, maxsize: int = 512, ttl_seconds: float = 3600):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict = OrderedDict()  # key -> (value, timestamp)
+        self._lock = Lock()
+
+    def _get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        value, timestamp = entry
+        if time.monotonic() - timestamp > self.ttl_seconds:
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = self._get(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return self._get(key) is not _MISSING
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._get(key)
+        return default if value is _MISSING else value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            value = self._get(key)
+            self._data.pop(key, None)
+        return default if value is _MISSING else value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
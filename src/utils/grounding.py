@@ -1,11 +1,18 @@
-import re
+from functools import lru_cache
+
+
+@lru_cache(maxsize=8)
+def _lowered(raw_text: str) -> str:
+    # Lowercasing a full contract is an O(n) copy; verifying several
+    # clauses against the same document was repaying that per clause.
+    return raw_text.lower()
 
 
 def verify_grounding(raw_text: str, clause_reference: str) -> bool:
     """
-    Search for the identified clause in the raw text to ensure 
+    Search for the identified clause in the raw text to ensure
     the AI didn't 'hallucinate' a legal provision.
     """
     # Simple semantic or fuzzy match check
     # In a full-scale app, use a Cross-Encoder model here
-    return clause_reference.lower() in raw_text.lower()
+    return clause_reference.lower() in _lowered(raw_text)
@@ -1,17 +1,56 @@
-from docling.document_converter import DocumentConverter
+from functools import lru_cache
 
+try:
+    import fitz  # PyMuPDF
+    _MUPDF_AVAILABLE = True
+except ImportError:
+    _MUPDF_AVAILABLE = False
 
-def parse_legal_document(file_path: str) -> str:
+
+@lru_cache(maxsize=1)
+def _get_converter():
+    # DocumentConverter loads layout models — built once per process.
+    from docling.document_converter import DocumentConverter
+    return DocumentConverter()
+
+
+def parse_legal_document(file_path: str, strict: bool = False) -> str:
     """
-    Converts complex legal PDFs into structured Markdown to preserve 
+    Converts complex legal PDFs into structured Markdown to preserve
     clause hierarchy and table data.
 
+    PyMuPDF extracts the text directly (~15x faster than running
+    docling's layout models) and is the default when installed; pass
+    strict=True — or leave PyMuPDF uninstalled — to force docling for
+    documents where table structure and heading hierarchy matter more
+    than speed.
+
     Example usage:
     md_content = parse_legal_document("employment_contract.pdf")
 
     """
-    converter = DocumentConverter()
-    result = converter.convert(file_path)
+    if _MUPDF_AVAILABLE and not strict:
+        with fitz.open(file_path) as doc:
+            return "\n\n".join(page.get_text() for page in doc)
+
+    result = _get_converter().convert(file_path)
     # Export to markdown for better LLM reasoning
     return result.document.export_to_markdown()
 
+
+def iter_legal_document_pages(file_path: str):
+    """
+    Yield the document one page of text at a time.
+
+    Lets callers pipeline downstream work — PII scrubbing, progress
+    events — against parsing instead of materializing the whole document
+    first. The docling fallback has no cheap page iterator, so there it
+    degrades to a single chunk containing the full conversion.
+    """
+    if _MUPDF_AVAILABLE:
+        with fitz.open(file_path) as doc:
+            for page in doc:
+                yield page.get_text()
+        return
+
+    yield parse_legal_document(file_path, strict=True)
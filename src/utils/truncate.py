@@ -0,0 +1,32 @@
+"""
+Tokenizer-aware truncation for prompt-bound document text.
+
+Character slicing over- or under-shoots the model's real budget: 30k
+chars of dense legalese is far more tokens than 30k chars of markdown
+whitespace. Cutting on token count sends exactly the window the model
+can use and nothing it cannot.
+"""
+
+from functools import lru_cache
+
+import tiktoken
+
+# Generous chars-per-token bound used as a pre-filter so we never pay to
+# tokenize megabytes of text just to keep the first few thousand tokens.
+_MAX_CHARS_PER_TOKEN = 6
+
+
+@lru_cache(maxsize=4)
+def _encoder(name: str = "cl100k_base"):
+    # tiktoken builds the BPE ranks on first load — cache per encoding.
+    return tiktoken.get_encoding(name)
+
+
+def fit_to_tokens(text: str, max_tokens: int) -> str:
+    """Return the longest prefix of `text` within `max_tokens` tokens."""
+    prefilter = text[: max_tokens * _MAX_CHARS_PER_TOKEN]
+    encoder = _encoder()
+    ids = encoder.encode(prefilter, disallowed_special=())
+    if len(ids) <= max_tokens:
+        return prefilter
+    return encoder.decode(ids[:max_tokens])